@@ -1,6 +1,8 @@
-import copy
+import argparse
+import functools
+import multiprocessing
 import pathlib
-from typing import List
+from typing import List, Set, Tuple
 from enum import Enum
 
 # The given solutions need to be updated to the correct values.
@@ -16,65 +18,12 @@ def check_if_guard_needs_to_turn(tile_in_walking_direction: str) -> bool:
     return tile_in_walking_direction == "#" or tile_in_walking_direction == "O"
 
 
-def turn_guard(
-    area: List[List[str]], guard_position: List[int], guard_direction: List[int]
-) -> None:
-    guard_state = area[guard_position[0]][guard_position[1]]
-    if guard_state == "^":
-        guard_state = ">"
-    elif guard_state == ">":
-        guard_state = "v"
-    elif guard_state == "v":
-        guard_state = "<"
-    elif guard_state == "<":
-        guard_state = "^"
-    else:
-        raise ValueError(f"Invalid guard state: {guard_state}")
-    area[guard_position[0]][guard_position[1]] = guard_state
-    guard_direction[0], guard_direction[1] = get_direction_of_guard(guard_state)
-
-
 class State(Enum):
     IN_AREA = 1
     LEFT_AREA = 2
     IN_LOOP = 3
 
 
-def update_position_of_guard(
-    area: List[List[str]],
-    guard_position: List[int],
-    guard_direction: List[int],
-) -> State:
-    guard_state = area[guard_position[0]][guard_position[1]]
-    new_i = guard_position[0] + guard_direction[0]
-    new_j = guard_position[1] + guard_direction[1]
-    if (
-        new_i < 0
-        or new_i >= len(area)
-        or new_j < 0
-        or new_j >= len(area[guard_position[0]])
-    ):
-        return State.LEFT_AREA
-    if area[new_i][new_j] == guard_state:
-        return State.IN_LOOP
-    if not check_if_guard_needs_to_turn(area[new_i][new_j]):
-        guard_position[0] = new_i
-        guard_position[1] = new_j
-        area[new_i][new_j] = guard_state
-        return State.IN_AREA
-    turn_guard(area, guard_position, guard_direction)
-    return State.IN_AREA
-
-
-def count_number_of_visited_tiles(area: List[List[str]]) -> int:
-    return sum(
-        [
-            row.count("^") + row.count("v") + row.count("<") + row.count(">")
-            for row in area
-        ]
-    )
-
-
 def tile_contains_guard(tile: str) -> bool:
     return tile in ["^", "v", "<", ">"]
 
@@ -99,64 +48,217 @@ def get_direction_of_guard(guard_state: str) -> List[int]:
     raise ValueError(f"Invalid guard state: {guard_state}")
 
 
-def solve_first_part(original_area: List[List[str]]) -> int:
-    area = copy.deepcopy(original_area)
-    guard_position = get_guard_position(area)
-    guard_direction = get_direction_of_guard(area[guard_position[0]][guard_position[1]])
-    guard_in_area = State.IN_AREA
-    while guard_in_area == State.IN_AREA:
-        guard_in_area = update_position_of_guard(area, guard_position, guard_direction)
-
-    return count_number_of_visited_tiles(area)
-
-
-def get_tiles_on_the_guards_path(original_area: List[List[str]]) -> List[List[str]]:
-    area = copy.deepcopy(original_area)
-    guard_position = get_guard_position(area)
-    guard_direction = get_direction_of_guard(area[guard_position[0]][guard_position[1]])
-    guard_in_area = State.IN_AREA
-    while guard_in_area == State.IN_AREA:
-        guard_in_area = update_position_of_guard(area, guard_position, guard_direction)
-    # return list with all tiles the contain <, >, ^, v
-    return [
-        [i, j]
-        for i, row in enumerate(area)
-        for j, tile in enumerate(row)
-        if tile_contains_guard(tile)
-    ]
-
-
 def is_tile_empty(tile: str) -> bool:
     return tile == "."
 
 
-def solve_second_part(original_area: List[List[str]]) -> int:
-    size_of_area = len(original_area) * len(original_area[0])
-    original_guard_position = get_guard_position(original_area)
-    original_guard_orientation = get_direction_of_guard(
-        original_area[original_guard_position[0]][original_guard_position[1]]
-    )
+# The headings are ordered clockwise, so turning right is (heading + 1) % 4.
+guard_headings = ["^", ">", "v", "<"]
 
-    tiles_on_the_guards_path = get_tiles_on_the_guards_path(original_area)
-    number_of_positions_that_lead_to_loop = 0
-    for position in tiles_on_the_guards_path:
-        if not is_tile_empty(original_area[position[0]][position[1]]):
-            continue
-        area = copy.deepcopy(original_area)
-        area[position[0]][position[1]] = "O"
-        guard_position = copy.deepcopy(original_guard_position)
-        guard_direction = copy.deepcopy(original_guard_orientation)
-        guard_in_area = State.IN_AREA
-        for step in range(size_of_area):
-            guard_in_area = update_position_of_guard(
-                area, guard_position, guard_direction
+
+class ObstacleJumpTable:
+    def __init__(self, area: List[List[str]]):
+        self.rows = len(area)
+        self.columns = len(area[0])
+        self.offsets = [
+            direction[0] * self.columns + direction[1]
+            for direction in map(get_direction_of_guard, guard_headings)
+        ]
+        self.obstacles = bytearray(
+            check_if_guard_needs_to_turn(tile) for row in area for tile in row
+        )
+        # For every heading and tile the tile in front of the next obstacle, or -1 if the guard leaves the area.
+        self.next_stop = [
+            self.build_stops(get_direction_of_guard(heading))
+            for heading in guard_headings
+        ]
+
+    def build_stops(self, direction: List[int]) -> List[int]:
+        stops = [-1] * (self.rows * self.columns)
+        # Tiles are visited such that the neighbour in walking direction is always known already.
+        rows = range(self.rows - 1, -1, -1) if direction[0] > 0 else range(self.rows)
+        columns = (
+            range(self.columns - 1, -1, -1) if direction[1] > 0 else range(self.columns)
+        )
+        for i in rows:
+            for j in columns:
+                new_i = i + direction[0]
+                new_j = j + direction[1]
+                if (
+                    new_i < 0
+                    or new_i >= self.rows
+                    or new_j < 0
+                    or new_j >= self.columns
+                ):
+                    continue
+                index = i * self.columns + j
+                next_index = new_i * self.columns + new_j
+                if self.obstacles[next_index]:
+                    stops[index] = index
+                else:
+                    stops[index] = stops[next_index]
+        return stops
+
+    def jump(self, position: int, heading: int, extra_obstacle: int = -1) -> int:
+        stop = self.next_stop[heading][position]
+        if extra_obstacle < 0:
+            return stop
+        offset = self.offsets[heading]
+        distance_to_obstacle, remainder = divmod(extra_obstacle - position, offset)
+        if remainder != 0 or distance_to_obstacle <= 0:
+            return stop
+        if (heading == 1 or heading == 3) and (
+            extra_obstacle // self.columns != position // self.columns
+        ):
+            return stop
+        if stop >= 0 and (stop - position) // offset < distance_to_obstacle:
+            return stop
+        return extra_obstacle - offset
+
+
+class GuardWalk:
+    def __init__(
+        self, state: State, turning_points: List[Tuple[int, int]], walker
+    ) -> None:
+        self.state = state
+        self.turning_points = turning_points
+        self.walker = walker
+
+    def get_trace(self) -> List[Tuple[int, int]]:
+        # Every state (tile, heading) of the walk in order, a turning point is listed once with its new heading.
+        jump_table = self.walker.jump_table
+        trace = []
+        segment_ends = [position for position, _ in self.turning_points[1:]]
+        if self.state == State.LEFT_AREA:
+            exit_position = self.walker.get_exit_position(*self.turning_points[-1])
+            segment_ends.append(
+                exit_position + jump_table.offsets[self.turning_points[-1][1]]
             )
-            if guard_in_area == State.LEFT_AREA or guard_in_area == State.IN_LOOP:
+        for (position, heading), end in zip(self.turning_points, segment_ends):
+            offset = jump_table.offsets[heading]
+            trace.extend((index, heading) for index in range(position, end, offset))
+        return trace
+
+    def get_visited_tiles(self) -> Set[Tuple[int, int]]:
+        return {
+            divmod(position, self.walker.jump_table.columns)
+            for position, _ in self.get_trace()
+        }
+
+
+class GuardWalker:
+    def __init__(self, area: List[List[str]]):
+        self.jump_table = ObstacleJumpTable(area)
+        guard_position = get_guard_position(area)
+        self.start_position = (
+            guard_position[0] * self.jump_table.columns + guard_position[1]
+        )
+        self.start_heading = guard_headings.index(
+            area[guard_position[0]][guard_position[1]]
+        )
+        # One flag per tile and heading, only set for the turning points of the current walk.
+        self.visited_turns = bytearray(
+            4 * self.jump_table.rows * self.jump_table.columns
+        )
+
+    def get_exit_position(self, position: int, heading: int) -> int:
+        i, j = divmod(position, self.jump_table.columns)
+        if heading == 0:
+            return j
+        if heading == 1:
+            return i * self.jump_table.columns + self.jump_table.columns - 1
+        if heading == 2:
+            return (self.jump_table.rows - 1) * self.jump_table.columns + j
+        return i * self.jump_table.columns
+
+    def walk(
+        self,
+        extra_obstacle: List[int] | None = None,
+        start: Tuple[int, int] | None = None,
+    ) -> GuardWalk:
+        obstacle = -1
+        if extra_obstacle is not None:
+            obstacle = extra_obstacle[0] * self.jump_table.columns + extra_obstacle[1]
+        position, heading = (
+            (self.start_position, self.start_heading) if start is None else start
+        )
+        turning_points = [(position, heading)]
+        state = State.LEFT_AREA
+        while True:
+            position = self.jump_table.jump(position, heading, obstacle)
+            if position < 0:
                 break
-        if guard_in_area == State.IN_LOOP or step == size_of_area - 1:
-            number_of_positions_that_lead_to_loop += 1
+            heading = (heading + 1) % 4
+            turning_points.append((position, heading))
+            if self.visited_turns[4 * position + heading]:
+                state = State.IN_LOOP
+                break
+            self.visited_turns[4 * position + heading] = 1
+
+        for position, heading in turning_points[1:]:
+            self.visited_turns[4 * position + heading] = 0
+        return GuardWalk(state, turning_points, self)
+
+
+def solve_first_part(original_area: List[List[str]]) -> int:
+    return len(GuardWalker(original_area).walk().get_visited_tiles())
+
+
+def get_obstacle_candidates(
+    walker: GuardWalker, original_area: List[List[str]]
+) -> List[Tuple[List[int], Tuple[int, int]]]:
+    trace = walker.walk().get_trace()
+    visited_tiles = bytearray(walker.jump_table.rows * walker.jump_table.columns)
+    visited_tiles[trace[0][0]] = 1
+    candidates = []
+    # Up to the first visit of a tile the guard follows the unobstructed path, so each candidate resumes from the state in front of it.
+    for previous_state, (position, _) in zip(trace, trace[1:]):
+        if visited_tiles[position]:
+            continue
+        visited_tiles[position] = 1
+        i, j = divmod(position, walker.jump_table.columns)
+        if is_tile_empty(original_area[i][j]):
+            candidates.append(([i, j], previous_state))
+    return candidates
+
+
+def count_loops(
+    walker: GuardWalker, candidates: List[Tuple[List[int], Tuple[int, int]]]
+) -> int:
+    return sum(
+        walker.walk(obstacle, start).state == State.IN_LOOP
+        for obstacle, start in candidates
+    )
+
+
+# Each worker process builds its own walker once from the shared area and reuses it for all chunks.
+worker_guard_walker = None
+
+
+def initialize_worker(area: str) -> None:
+    global worker_guard_walker
+    worker_guard_walker = GuardWalker(parse(area))
+
 
-    return number_of_positions_that_lead_to_loop
+def count_loops_in_worker(candidates: List[Tuple[List[int], Tuple[int, int]]]) -> int:
+    return count_loops(worker_guard_walker, candidates)
+
+
+def solve_second_part(original_area: List[List[str]], workers: int = 1) -> int:
+    walker = GuardWalker(original_area)
+    candidates = get_obstacle_candidates(walker, original_area)
+    if workers <= 1:
+        return count_loops(walker, candidates)
+
+    chunk_size = max(1, len(candidates) // (8 * workers))
+    chunks = [
+        candidates[i : i + chunk_size] for i in range(0, len(candidates), chunk_size)
+    ]
+    area = "\n".join("".join(row) for row in original_area)
+    with multiprocessing.Pool(
+        workers, initializer=initialize_worker, initargs=(area,)
+    ) as pool:
+        return sum(pool.imap_unordered(count_loops_in_worker, chunks))
 
 
 def read_input_from_file(path: str) -> str:
@@ -186,6 +288,15 @@ def solve_part(
 
 
 def main():
+    argument_parser = argparse.ArgumentParser()
+    argument_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used for checking the obstacle candidates.",
+    )
+    arguments = argument_parser.parse_args()
+
     print("Reading inputs...")
     example_input = read_input_from_file("example.txt")
     input = read_input_from_file("input.txt")
@@ -203,7 +314,7 @@ def main():
     solve_part(
         example_area,
         area,
-        solve_second_part,
+        functools.partial(solve_second_part, workers=arguments.workers),
         given_example_solution_of_second_part,
     )
 
@@ -1,6 +1,11 @@
+import argparse
+import collections
 import copy
+import functools
+import multiprocessing
 import pathlib
-from typing import List
+import time
+from typing import Iterable, Iterator, List, Tuple
 import math
 
 # The given solutions need to be updated to the correct values.
@@ -13,6 +18,7 @@ class CalibrationEquation:
         self.test_value = int(input.split(":")[0].strip())
         self.numbers = list(map(int, input.split(":")[1].strip().split(" ")))
         self.operations = ["+"] * (len(self.numbers) - 1)
+        self.powers_of_ten = [10 ** len(str(number)) for number in self.numbers]
 
     def evaluate(self) -> int:
         result = self.numbers[0]
@@ -22,7 +28,7 @@ class CalibrationEquation:
             elif self.operations[i] == "*":
                 result *= self.numbers[i + 1]
             elif self.operations[i] == "||":
-                result = int(str(result) + str(self.numbers[i + 1]))
+                result = result * self.powers_of_ten[i + 1] + self.numbers[i + 1]
         return result
 
     def permutate_multiplications_and_additions(self) -> bool:
@@ -58,6 +64,90 @@ class CalibrationEquation:
                 self.operations[i] = "+"
         return permutate_two_operations(self.operations, "+", "||")
 
+    def can_be_solved_backwards(self, operations: List[str]) -> bool:
+        # Undo the operations from right to left, every operation that cannot be undone prunes all permutations of the numbers to its left.
+        targets = [(self.test_value, len(self.numbers) - 1)]
+        while targets:
+            target, index = targets.pop()
+            if index == 0:
+                if target == self.numbers[0]:
+                    return True
+                continue
+            for operation in operations:
+                # Multiplying by zero gives zero for any result of the numbers to its left.
+                if operation == "*" and self.numbers[index] == 0 and target == 0:
+                    return True
+                previous_target = inverse_operations[operation](
+                    target, self.numbers[index], self.powers_of_ten[index]
+                )
+                if previous_target is not None:
+                    targets.append((previous_target, index - 1))
+        return False
+
+    def can_be_solved_forwards(self, operations: List[str]) -> bool:
+        # Depth-first search over the results of all operator prefixes, so a prefix is only evaluated once for all its permutations.
+        # Without zeros no operation decreases the result, so results above the test value can be abandoned.
+        prune_large_results = 0 not in self.numbers[1:]
+        results = [(self.numbers[0], 1)]
+        while results:
+            result, index = results.pop()
+            if index == len(self.numbers):
+                if result == self.test_value:
+                    return True
+                continue
+            for operation in operations:
+                next_result = forward_operations[operation](
+                    result, self.numbers[index], self.powers_of_ten[index]
+                )
+                if prune_large_results and next_result > self.test_value:
+                    continue
+                results.append((next_result, index + 1))
+        return False
+
+
+def add(result: int, number: int, _: int) -> int:
+    return result + number
+
+
+def multiply(result: int, number: int, _: int) -> int:
+    return result * number
+
+
+def concatenate(result: int, number: int, power_of_ten: int) -> int:
+    return result * power_of_ten + number
+
+
+forward_operations = {
+    "+": add,
+    "*": multiply,
+    "||": concatenate,
+}
+
+
+def undo_addition(target: int, number: int, _: int) -> int | None:
+    if target < number:
+        return None
+    return target - number
+
+
+def undo_multiplication(target: int, number: int, _: int) -> int | None:
+    if number == 0 or target % number != 0:
+        return None
+    return target // number
+
+
+def undo_concatenation(target: int, number: int, power_of_ten: int) -> int | None:
+    if target < number or (target - number) % power_of_ten != 0:
+        return None
+    return (target - number) // power_of_ten
+
+
+inverse_operations = {
+    "+": undo_addition,
+    "*": undo_multiplication,
+    "||": undo_concatenation,
+}
+
 
 def permutate_two_operations(operations: List[str], a: str, b: str) -> bool:
     number_of_multiplications = operations.count(b)
@@ -107,32 +197,158 @@ def parse(input: str) -> List[CalibrationEquation]:
     return [CalibrationEquation(line) for line in input.strip().split("\n")]
 
 
-def solve_first_part(calibration_equations: List[CalibrationEquation]) -> int:
-    sum = 0
-    for equation in calibration_equations:
-        more_permutations = True
-        while more_permutations:
-            result = equation.evaluate()
-            if result == equation.test_value:
-                sum += result
-                break
+def is_solvable_by_permutation(
+    equation: CalibrationEquation, operations: List[str]
+) -> bool:
+    equation.operations = ["+"] * (len(equation.numbers) - 1)
+    more_permutations = True
+    while more_permutations:
+        if equation.evaluate() == equation.test_value:
+            return True
+        if "||" in operations:
+            more_permutations = equation.permutate_all_operations()
+        else:
             more_permutations = equation.permutate_multiplications_and_additions()
+    return False
 
-    return sum
 
+def is_solvable_backwards(equation: CalibrationEquation, operations: List[str]) -> bool:
+    return equation.can_be_solved_backwards(operations)
 
-def solve_second_part(calibration_equations: List[CalibrationEquation]) -> int:
-    sum = 0
-    for equation in calibration_equations:
-        more_permutations = True
-        while more_permutations:
-            result = equation.evaluate()
-            if result == equation.test_value:
-                sum += result
-                break
-            more_permutations = equation.permutate_all_operations()
 
-    return sum
+def is_solvable_forwards(equation: CalibrationEquation, operations: List[str]) -> bool:
+    return equation.can_be_solved_forwards(operations)
+
+
+engines = {
+    "permutation": is_solvable_by_permutation,
+    "forward": is_solvable_forwards,
+    "backward": is_solvable_backwards,
+}
+
+
+def calculate_calibration_result(
+    calibration_equations: List[CalibrationEquation],
+    operations: List[str],
+    engine: str,
+) -> int:
+    is_solvable = engines[engine]
+    return sum(
+        equation.test_value
+        for equation in calibration_equations
+        if is_solvable(equation, operations)
+    )
+
+
+operations_of_first_part = ["+", "*"]
+operations_of_second_part = ["+", "*", "||"]
+
+
+def solve_first_part(
+    calibration_equations: List[CalibrationEquation], engine: str = "backward"
+) -> int:
+    return calculate_calibration_result(
+        calibration_equations, operations_of_first_part, engine
+    )
+
+
+def solve_second_part(
+    calibration_equations: List[CalibrationEquation], engine: str = "backward"
+) -> int:
+    return calculate_calibration_result(
+        calibration_equations, operations_of_second_part, engine
+    )
+
+
+def read_equations_lazily(path: str) -> Iterator[str]:
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                yield line
+
+
+def split_into_chunks(lines: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def get_timing_bucket(nanoseconds: int) -> int:
+    # The buckets are powers of ten, bucket i contains times from 10^i ns up to 10^(i + 1) ns.
+    return len(str(max(nanoseconds, 1))) - 1
+
+
+def solve_chunk(
+    lines: List[str], operations: List[str], engine: str
+) -> Tuple[int, List[int]]:
+    is_solvable = engines[engine]
+    calibration_result = 0
+    timing_histogram = []
+    for line in lines:
+        begin = time.perf_counter_ns()
+        equation = CalibrationEquation(line)
+        if is_solvable(equation, operations):
+            calibration_result += equation.test_value
+        bucket = get_timing_bucket(time.perf_counter_ns() - begin)
+        if bucket >= len(timing_histogram):
+            timing_histogram.extend([0] * (bucket + 1 - len(timing_histogram)))
+        timing_histogram[bucket] += 1
+    return calibration_result, timing_histogram
+
+
+def solve_batch(
+    path: str,
+    operations: List[str],
+    engine: str = "backward",
+    workers: int = 1,
+    chunk_size: int = 10000,
+) -> Tuple[int, List[int]]:
+    calibration_result = 0
+    timing_histogram = []
+
+    def merge(result: Tuple[int, List[int]]) -> None:
+        nonlocal calibration_result
+        calibration_result += result[0]
+        if len(result[1]) > len(timing_histogram):
+            timing_histogram.extend([0] * (len(result[1]) - len(timing_histogram)))
+        for bucket, count in enumerate(result[1]):
+            timing_histogram[bucket] += count
+
+    chunks = split_into_chunks(read_equations_lazily(path), chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            merge(solve_chunk(chunk, operations, engine))
+        return calibration_result, timing_histogram
+
+    # Only a few chunks per worker are in flight, so the file is never read into memory completely.
+    with multiprocessing.Pool(workers) as pool:
+        pending_results = collections.deque()
+        for chunk in chunks:
+            pending_results.append(
+                pool.apply_async(solve_chunk, (chunk, operations, engine))
+            )
+            if len(pending_results) >= 2 * workers:
+                merge(pending_results.popleft().get())
+        while pending_results:
+            merge(pending_results.popleft().get())
+    return calibration_result, timing_histogram
+
+
+def print_timing_histogram(timing_histogram: List[int]) -> None:
+    units = ["ns", "us", "ms", "s"]
+    for bucket, count in enumerate(timing_histogram):
+        if count == 0:
+            continue
+        if bucket < 9:
+            lower_limit = f"{10 ** (bucket % 3)} {units[bucket // 3]}"
+        else:
+            lower_limit = f"{10 ** (bucket - 9)} s"
+        print(f">= {lower_limit:>8}: {count}")
 
 
 def read_input_from_file(path: str) -> str:
@@ -162,6 +378,58 @@ def solve_part(
 
 
 def main():
+    argument_parser = argparse.ArgumentParser()
+    argument_parser.add_argument(
+        "--engine",
+        choices=engines.keys(),
+        default="backward",
+        help="Algorithm used for finding the operations of an equation.",
+    )
+    argument_parser.add_argument(
+        "--batch",
+        help="Only compute the calibration result of the equations in this file, reading it in chunks.",
+    )
+    argument_parser.add_argument(
+        "--part",
+        type=int,
+        choices=[1, 2],
+        default=2,
+        help="Puzzle part whose operations are used in batch mode.",
+    )
+    argument_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used in batch mode.",
+    )
+    argument_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=10000,
+        help="Number of equations sent to a process at once in batch mode.",
+    )
+    arguments = argument_parser.parse_args()
+
+    if arguments.batch is not None:
+        operations = (
+            operations_of_first_part
+            if arguments.part == 1
+            else operations_of_second_part
+        )
+        begin = time.time()
+        calibration_result, timing_histogram = solve_batch(
+            arguments.batch,
+            operations,
+            arguments.engine,
+            arguments.workers,
+            arguments.chunk_size,
+        )
+        print(f"{time.time() - begin} seconds needed to solve the batch.")
+        print(f"The calibration result is {calibration_result}")
+        print("Time needed per equation:")
+        print_timing_histogram(timing_histogram)
+        return
+
     print("Reading inputs...")
     example_input = read_input_from_file("example.txt")
     input = read_input_from_file("input.txt")
@@ -174,7 +442,7 @@ def main():
     solve_part(
         example_calibration_equations,
         calibration_equations,
-        solve_first_part,
+        functools.partial(solve_first_part, engine=arguments.engine),
         given_example_solution_of_first_part,
     )
 
@@ -182,7 +450,7 @@ def main():
     solve_part(
         example_calibration_equations,
         calibration_equations,
-        solve_second_part,
+        functools.partial(solve_second_part, engine=arguments.engine),
         given_example_solution_of_second_part,
     )
 
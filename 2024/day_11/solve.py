@@ -1,7 +1,11 @@
 import pathlib
-from typing import List
+from typing import Dict, List
 import time
-from functools import cache
+from collections import Counter, OrderedDict
+import argparse
+import bisect
+import json
+import numpy as np
 
 # The given solutions need to be updated to the correct values.
 given_example_solution_of_first_part = 55312
@@ -14,37 +18,235 @@ def parse(input: str, separator: str = " ") -> List[List[int]]:
     return list(map(int, input.split(separator)))
 
 
-@cache
-def count_stones(number: int, remaining_blinks: int) -> int:
-    if remaining_blinks == 0:
-        return 1
+powers_of_ten = [10**exponent for exponent in range(20)]
+
+
+def count_digits(number: int) -> int:
+    while number >= powers_of_ten[-1]:
+        powers_of_ten.append(10 * powers_of_ten[-1])
+    return bisect.bisect_right(powers_of_ten, number)
+
+
+def blink_at_stone(number: int) -> List[int]:
     if number == 0:
-        return count_stones(1, remaining_blinks - 1)
-    number_of_digits = len(str(number))
+        return [1]
+    number_of_digits = count_digits(number)
     if number_of_digits % 2 == 0:
-        first_half_of_digits = number // 10 ** (number_of_digits // 2)
-        second_half_of_digits = number % 10 ** (number_of_digits // 2)
-        return count_stones(first_half_of_digits, remaining_blinks - 1) + count_stones(
-            second_half_of_digits, remaining_blinks - 1
+        first_half_of_digits, second_half_of_digits = divmod(
+            number, powers_of_ten[number_of_digits // 2]
+        )
+        return [first_half_of_digits, second_half_of_digits]
+    return [number * 2024]
+
+
+class TransitionCache:
+    def __init__(self, maximum_size: int = 100000, path: str | None = None):
+        self.maximum_size = maximum_size
+        self.path = path
+        self.transitions = OrderedDict()
+        if path is not None and pathlib.Path(path).exists():
+            self.load()
+
+    def get(self, number: int) -> List[int]:
+        next_numbers = self.transitions.get(number)
+        if next_numbers is not None:
+            self.transitions.move_to_end(number)
+            return next_numbers
+        next_numbers = blink_at_stone(number)
+        self.transitions[number] = next_numbers
+        if len(self.transitions) > self.maximum_size:
+            self.transitions.popitem(
+                last=False
+            )  # Evict the least recently used transition.
+        return next_numbers
+
+    def load(self) -> None:
+        transitions = json.loads(pathlib.Path(self.path).read_text())
+        for number, next_numbers in transitions[-self.maximum_size :]:
+            self.transitions[number] = next_numbers
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        # Stored from least to most recently used, so loading restores the eviction order.
+        pathlib.Path(self.path).write_text(json.dumps(list(self.transitions.items())))
+
+
+transition_cache = TransitionCache()
+
+
+def blink(
+    histogram: Dict[int, int],
+    number_of_blinks: int,
+    cache: TransitionCache | None = None,
+) -> Dict[int, int]:
+    if cache is None:
+        cache = transition_cache
+    # Stones with the same number evolve identically, so only the number of stones per number is tracked.
+    for _ in range(number_of_blinks):
+        next_histogram = Counter()
+        for number, multiplicity in histogram.items():
+            for next_number in cache.get(number):
+                next_histogram[next_number] += multiplicity
+        histogram = next_histogram
+    return histogram
+
+
+def count_stones(numbers: List[int], number_of_blinks: int) -> int:
+    return sum(blink(Counter(numbers), number_of_blinks).values())
+
+
+def dot_product(a: np.ndarray, b: np.ndarray, modulus: int) -> int:
+    # Entries below 2**31 are split into 16 bit halves, so the sums of products stay exact in int64.
+    return (
+        int(np.dot(a & 0xFFFF, b)) + (int(np.dot(a >> 16, b)) % modulus << 16)
+    ) % modulus
+
+
+def multiply_polynomials(a: np.ndarray, b: np.ndarray, modulus: int) -> np.ndarray:
+    a_low, a_high = a & 0xFFFF, a >> 16
+    b_low, b_high = b & 0xFFFF, b >> 16
+    low = np.convolve(a_low, b_low) % modulus
+    middle = (np.convolve(a_low, b_high) + np.convolve(a_high, b_low)) % modulus
+    high = np.convolve(a_high, b_high) % modulus
+    return (low + (middle << 16) % modulus + ((high << 16) % modulus << 16)) % modulus
+
+
+def find_linear_recurrence(sequence: np.ndarray, modulus: int) -> np.ndarray:
+    # Berlekamp-Massey modulo a prime, returns the coefficients c of the shortest recurrence
+    # sequence[t] == sum(c[i] * sequence[t - 1 - i]) for all t >= len(c).
+    connection = np.zeros(len(sequence) + 1, dtype=np.int64)
+    connection[0] = 1
+    previous_connection = connection.copy()
+    length = 0
+    previous_length = 0
+    previous_discrepancy = 1
+    shift = 1
+    for n in range(len(sequence)):
+        discrepancy = dot_product(
+            connection[: length + 1], sequence[n - length : n + 1][::-1], modulus
         )
-    return count_stones(number * 2024, remaining_blinks - 1)
+        if discrepancy == 0:
+            shift += 1
+            continue
+        factor = discrepancy * pow(previous_discrepancy, -1, modulus) % modulus
+        old_connection = connection.copy() if 2 * length <= n else None
+        end = shift + previous_length + 1
+        connection[shift:end] = (
+            connection[shift:end] - factor * previous_connection[: previous_length + 1]
+        ) % modulus
+        if old_connection is not None:
+            previous_connection = old_connection
+            previous_length = length
+            previous_discrepancy = discrepancy
+            length = n + 1 - length
+            shift = 1
+        else:
+            shift += 1
+    return -connection[1 : length + 1] % modulus
 
 
-def solve_first_part(numbers: List[List[int]]) -> int:
+def raise_x_modulo_recurrence(
+    exponent: int, coefficients: np.ndarray, modulus: int
+) -> np.ndarray:
+    # Coefficients r of x**exponent modulo the characteristic polynomial, so sequence[exponent] == sum(r[j] * sequence[j]).
+    order = len(coefficients)
+    reversed_coefficients = coefficients[::-1]
+
+    def reduce(polynomial: np.ndarray) -> np.ndarray:
+        # x**order is replaced by sum(c[i] * x**(order - 1 - i)) from the highest power downwards.
+        polynomial = polynomial.copy()
+        for power in range(len(polynomial) - 1, order - 1, -1):
+            coefficient = polynomial[power]
+            if coefficient != 0:
+                window = slice(power - order, power)
+                polynomial[window] = (
+                    polynomial[window] + coefficient * reversed_coefficients
+                ) % modulus
+        return polynomial[:order]
+
+    result = np.zeros(order, dtype=np.int64)
+    result[0] = 1
+    for bit in bin(exponent)[2:]:
+        result = reduce(multiply_polynomials(result, result, modulus))
+        if bit == "1":
+            result = reduce(np.concatenate(([0], result)))
+    return result
+
+
+class StoneTransitionMatrix:
+    def __init__(self, numbers: List[int], cache: TransitionCache | None = None):
+        if cache is None:
+            cache = transition_cache
+        # Discover all stone numbers reachable from the given numbers, each transition i -> j is stored once per created stone.
+        self.numbers = list(dict.fromkeys(numbers))
+        self.indices = {number: i for i, number in enumerate(self.numbers)}
+        sources = []
+        targets = []
+        for i, number in enumerate(self.numbers):
+            for next_number in cache.get(number):
+                if next_number not in self.indices:
+                    self.indices[next_number] = len(self.numbers)
+                    self.numbers.append(next_number)
+                sources.append(i)
+                targets.append(self.indices[next_number])
+        self.sources = np.array(sources, dtype=np.int64)
+        self.targets = np.array(targets, dtype=np.int64)
+
+    def count_sequence(
+        self, numbers: List[int], length: int, modulus: int
+    ) -> np.ndarray:
+        # The number of stones after 0, 1, ..., length - 1 blinks modulo the given prime.
+        vector = np.bincount(
+            [self.indices[number] for number in numbers], minlength=len(self.numbers)
+        ).astype(np.int64)
+        sequence = np.zeros(length, dtype=np.int64)
+        for blinks in range(length):
+            sequence[blinks] = vector.sum() % modulus
+            # The float sums stay exact, as each number is reached by less than 2**22 transitions.
+            vector = (
+                np.bincount(
+                    self.targets,
+                    weights=vector[self.sources],
+                    minlength=len(self.numbers),
+                ).astype(np.int64)
+                % modulus
+            )
+        return sequence
+
+    def count(
+        self, numbers: List[int], number_of_blinks: int, modulus: int | None = None
+    ) -> int:
+        # Exact counts have a number of digits growing linearly with the blinks, so they are counted by blinking.
+        if modulus is None:
+            return count_stones(numbers, number_of_blinks)
+        if modulus >= 2**31:
+            raise ValueError("The modulus needs to be a prime below 2**31.")
+        # The number of stones is u * M**t * v for the n x n transition matrix M, so it satisfies a linear
+        # recurrence of order at most n, which is found from its first 2n values.
+        sequence = self.count_sequence(
+            numbers, min(number_of_blinks + 1, 2 * len(self.numbers)), modulus
+        )
+        if number_of_blinks < len(sequence):
+            return int(sequence[number_of_blinks])
+        coefficients = find_linear_recurrence(sequence, modulus)
+        if len(coefficients) == 0:
+            return 0
+        powers = raise_x_modulo_recurrence(number_of_blinks, coefficients, modulus)
+        return dot_product(powers, sequence[: len(coefficients)], modulus)
+
+
+def solve_first_part(numbers: List[int]) -> int:
     start = time.time()
-    number_of_stones = 0
-    for number in numbers:
-        number_of_stones += count_stones(number, 25)
+    number_of_stones = count_stones(numbers, 25)
     print(f"Execution time: {time.time() - start}")
 
     return number_of_stones
 
 
-def solve_second_part(numbers: List[List[int]]) -> int:
+def solve_second_part(numbers: List[int]) -> int:
     start = time.time()
-    number_of_stones = 0
-    for number in numbers:
-        number_of_stones += count_stones(number, 75)
+    number_of_stones = count_stones(numbers, 75)
     print(f"Execution time: {time.time() - start}")
 
     return number_of_stones
@@ -77,6 +279,51 @@ def solve_part(
 
 
 def main():
+    argument_parser = argparse.ArgumentParser()
+    argument_parser.add_argument(
+        "--cache-file",
+        help="JSON file the stone transitions are loaded from and stored to.",
+    )
+    argument_parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=100000,
+        help="Maximum number of stone transitions kept in the cache.",
+    )
+    argument_parser.add_argument(
+        "--blinks",
+        type=int,
+        help="Only count the stones of the input after this many blinks using the linear recurrence of the counts.",
+    )
+    argument_parser.add_argument(
+        "--modulus",
+        type=int,
+        help="Count the stones modulo this prime below 2**31, needed for the recurrence to be used.",
+    )
+    arguments = argument_parser.parse_args()
+    global transition_cache
+    transition_cache = TransitionCache(arguments.cache_size, arguments.cache_file)
+
+    if arguments.blinks is not None:
+        input = read_input_from_file("input.txt")
+        if input is None:
+            return
+        numbers = parse(input)
+        start = time.time()
+        transition_matrix = StoneTransitionMatrix(numbers)
+        print(
+            f"Found {len(transition_matrix.numbers)} reachable stone numbers in {time.time() - start} seconds."
+        )
+        number_of_stones = transition_matrix.count(
+            numbers, arguments.blinks, arguments.modulus
+        )
+        print(f"Execution time: {time.time() - start}")
+        print(
+            f"The number of stones after {arguments.blinks} blinks is {number_of_stones}"
+        )
+        transition_cache.save()
+        return
+
     print("Reading inputs...")
     example_input = read_input_from_file("example.txt")
     input = read_input_from_file("input.txt")
@@ -98,6 +345,8 @@ def main():
         given_example_solution_of_second_part,
     )
 
+    transition_cache.save()
+
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,10 @@
+import argparse
+import functools
+import itertools
 import pathlib
-from typing import List, Tuple
+from array import array
+import numpy as np
+from typing import Iterable, Iterator, List, Tuple
 
 # The given solutions need to be updated to the correct values.
 given_example_solution_of_first_part = 1930
@@ -11,24 +16,6 @@ class Region:
         self.plots = {(x, y)}
         self.plant_type = plant_type
 
-    def extend(self, map: List[List[str]], x: int, y: int):
-        if x - 1 >= 0 and map[x - 1][y] == self.plant_type:
-            self.plots.add((x - 1, y))
-            map[x - 1][y] = "."
-            self.extend(map, x - 1, y)
-        if x + 1 < len(map) and map[x + 1][y] == self.plant_type:
-            self.plots.add((x + 1, y))
-            map[x + 1][y] = "."
-            self.extend(map, x + 1, y)
-        if y - 1 >= 0 and map[x][y - 1] == self.plant_type:
-            self.plots.add((x, y - 1))
-            map[x][y - 1] = "."
-            self.extend(map, x, y - 1)
-        if y + 1 < len(map[0]) and map[x][y + 1] == self.plant_type:
-            self.plots.add((x, y + 1))
-            map[x][y + 1] = "."
-            self.extend(map, x, y + 1)
-
     def calculate_area(self):
         return len(self.plots)
 
@@ -157,32 +144,368 @@ def parse(input: str) -> List[List[int]]:
     return [list(line) for line in input.strip().split("\n")]
 
 
-def find_regions(map: List[List[int]]) -> List[Region]:
-    regions = []
+def label_regions(map: List[List[str]]) -> Tuple[array, int]:
+    # Flood fill with an explicit stack, every plot gets the index of its region in a flat array.
+    number_of_rows = len(map)
+    number_of_columns = len(map[0])
+    labels = array("i", [-1]) * (number_of_rows * number_of_columns)
+    number_of_regions = 0
     for x, row in enumerate(map):
         for y, plant_type in enumerate(row):
-            if plant_type == ".":
+            if labels[x * number_of_columns + y] >= 0:
                 continue
-            regions.append(Region(x, y, plant_type))
-            regions[-1].extend(map, x, y)
+            labels[x * number_of_columns + y] = number_of_regions
+            plots_to_visit = [(x, y)]
+            while plots_to_visit:
+                plot_x, plot_y = plots_to_visit.pop()
+                for neighbour_x, neighbour_y in [
+                    (plot_x - 1, plot_y),
+                    (plot_x + 1, plot_y),
+                    (plot_x, plot_y - 1),
+                    (plot_x, plot_y + 1),
+                ]:
+                    if (
+                        neighbour_x < 0
+                        or neighbour_x >= number_of_rows
+                        or neighbour_y < 0
+                        or neighbour_y >= number_of_columns
+                    ):
+                        continue
+                    index = neighbour_x * number_of_columns + neighbour_y
+                    if (
+                        labels[index] < 0
+                        and map[neighbour_x][neighbour_y] == plant_type
+                    ):
+                        labels[index] = number_of_regions
+                        plots_to_visit.append((neighbour_x, neighbour_y))
+            number_of_regions += 1
+    return labels, number_of_regions
+
+
+def find_regions(map: List[List[str]]) -> List[Region]:
+    labels, _ = label_regions(map)
+    regions = []
+    for x, row in enumerate(map):
+        for y, plant_type in enumerate(row):
+            label = labels[x * len(row) + y]
+            if label == len(regions):
+                regions.append(Region(x, y, plant_type))
+            else:
+                regions[label].plots.add((x, y))
     return regions
 
 
-def solve_first_part(regions: List[Region]) -> int:
-    price_for_fences = 0
-    for region in regions:
-        price_for_fences += region.calculate_circumference() * region.calculate_area()
-    return price_for_fences
+def calculate_statistics_of_region_objects(
+    map: List[List[str]],
+) -> Tuple[List[int], List[int], List[int]]:
+    regions = find_regions(map)
+    return (
+        [region.calculate_area() for region in regions],
+        [region.calculate_circumference() for region in regions],
+        [region.calculate_number_of_edges() for region in regions],
+    )
+
+
+def calculate_statistics_by_corners(
+    map: List[List[str]],
+) -> Tuple[List[int], List[int], List[int]]:
+    labels, number_of_regions = label_regions(map)
+    number_of_rows = len(map)
+    number_of_columns = len(map[0])
+    areas = [0] * number_of_regions
+    perimeters = [0] * number_of_regions
+    number_of_sides = [0] * number_of_regions
+    for label in labels:
+        areas[label] += 1
+
+    # Every window of 2x2 plots around a grid point is visited once, plots outside the map have the label -1.
+    # A region has a corner at the grid point if it covers one or three of the plots, or two diagonal ones which are two corners.
+    # The fence segments between the lower right plot and its upper and left neighbour are counted in the same window.
+    outside = [-1] * (number_of_columns + 2)
+    upper_row = outside
+    for x in range(number_of_rows + 1):
+        lower_row = outside
+        if x < number_of_rows:
+            row = labels[x * number_of_columns : (x + 1) * number_of_columns]
+            lower_row = [-1] + row.tolist() + [-1]
+        for y in range(number_of_columns + 1):
+            upper_left = upper_row[y]
+            upper_right = upper_row[y + 1]
+            lower_left = lower_row[y]
+            lower_right = lower_row[y + 1]
+            if upper_right != lower_right:
+                if upper_right >= 0:
+                    perimeters[upper_right] += 1
+                if lower_right >= 0:
+                    perimeters[lower_right] += 1
+            if lower_left != lower_right:
+                if lower_left >= 0:
+                    perimeters[lower_left] += 1
+                if lower_right >= 0:
+                    perimeters[lower_right] += 1
+            for label in {upper_left, upper_right, lower_left, lower_right}:
+                if label < 0:
+                    continue
+                covered_plots = (
+                    (upper_left == label)
+                    + (upper_right == label)
+                    + (lower_left == label)
+                    + (lower_right == label)
+                )
+                if covered_plots == 1 or covered_plots == 3:
+                    number_of_sides[label] += 1
+                elif covered_plots == 2 and (
+                    upper_left == lower_right or upper_right == lower_left
+                ):
+                    number_of_sides[label] += 2
+        upper_row = lower_row
+    return areas, perimeters, number_of_sides
+
+
+def get_plant_types(map: List[List[str]]) -> np.ndarray:
+    return np.frombuffer(
+        "".join("".join(row) for row in map).encode("utf-32-le"), dtype=np.uint32
+    ).reshape(len(map), len(map[0]))
+
+
+def label_regions_with_numpy(plant_types: np.ndarray) -> Tuple[np.ndarray, int]:
+    # Plots of a horizontal run of the same plant type are connected anyway, so the union-find works on the runs.
+    # The roots of runs touching vertically with the same plant type are hooked onto the smaller root, then the
+    # parents are compressed by pointer jumping until every run points to its root.
+    is_run_start = np.ones(plant_types.shape, dtype=bool)
+    is_run_start[:, 1:] = plant_types[:, 1:] != plant_types[:, :-1]
+    runs = np.cumsum(is_run_start, dtype=np.int32).reshape(plant_types.shape) - 1
+    is_same_below = plant_types[:-1, :] == plant_types[1:, :]
+    upper_runs = runs[:-1, :][is_same_below]
+    lower_runs = runs[1:, :][is_same_below]
+    parents = np.arange(runs[-1, -1] + 1, dtype=np.int32)
+    while len(upper_runs) > 0:
+        upper_roots = parents[upper_runs]
+        lower_roots = parents[lower_runs]
+        is_separated = upper_roots != lower_roots
+        upper_runs = upper_runs[is_separated]
+        lower_runs = lower_runs[is_separated]
+        upper_roots = upper_roots[is_separated]
+        lower_roots = lower_roots[is_separated]
+        np.minimum.at(
+            parents,
+            np.maximum(upper_roots, lower_roots),
+            np.minimum(upper_roots, lower_roots),
+        )
+        while True:
+            grandparents = parents[parents]
+            if np.array_equal(grandparents, parents):
+                break
+            parents = grandparents
+    # The root is the first run of a region, so the regions are numbered in the same order as by label_regions.
+    is_root = parents == np.arange(len(parents))
+    region_indices = np.cumsum(is_root, dtype=np.int32) - 1
+    return region_indices[parents][runs], int(is_root.sum())
+
+
+def calculate_statistics_with_numpy(
+    map: List[List[str]],
+) -> Tuple[List[int], List[int], List[int]]:
+    plant_types = get_plant_types(map)
+    labels, number_of_regions = label_regions_with_numpy(plant_types)
+    areas = np.bincount(labels.ravel(), minlength=number_of_regions)
+
+    # Neighbouring plots of the same plant type belong to the same region and share no fence,
+    # all other sides of a plot are fence segments.
+    is_same_below = plant_types[:-1, :] == plant_types[1:, :]
+    is_same_right = plant_types[:, :-1] == plant_types[:, 1:]
+    perimeters = 4 * areas
+    perimeters -= 2 * np.bincount(
+        labels[:-1, :][is_same_below], minlength=number_of_regions
+    )
+    perimeters -= 2 * np.bincount(
+        labels[:, :-1][is_same_right], minlength=number_of_regions
+    )
+
+    # Every corner of a region is a corner of one of its plots: either both sides next to the corner are fences,
+    # or neither is but the diagonal plot belongs to another region. The number of sides equals the number of corners.
+    padded_plant_types = np.pad(plant_types, 1)
+    plots = padded_plant_types[1:-1, 1:-1]
+
+    def is_same_plant_type(row_offset: int, column_offset: int) -> np.ndarray:
+        return (
+            padded_plant_types[
+                1 + row_offset : padded_plant_types.shape[0] - 1 + row_offset,
+                1 + column_offset : padded_plant_types.shape[1] - 1 + column_offset,
+            ]
+            == plots
+        )
+
+    corners = np.zeros(plots.shape, dtype=np.int8)
+    for row_offset, column_offset in [(-1, -1), (-1, 1), (1, -1), (1, 1)]:
+        is_same_vertically = is_same_plant_type(row_offset, 0)
+        is_same_horizontally = is_same_plant_type(0, column_offset)
+        corners += ~(is_same_vertically | is_same_horizontally)
+        corners += (
+            is_same_vertically
+            & is_same_horizontally
+            & ~is_same_plant_type(row_offset, column_offset)
+        )
+    number_of_sides = np.bincount(
+        labels.ravel(), weights=corners.ravel(), minlength=number_of_regions
+    ).astype(np.int64)
+    return areas.tolist(), perimeters.tolist(), number_of_sides.tolist()
+
+
+class RegionsOfTwoRows:
+    def __init__(self) -> None:
+        self.parents = []
+        self.plant_types = []
+        self.areas = []
+        self.perimeters = []
+        self.number_of_sides = []
+
+    def add_region(self, plant_type: str) -> int:
+        self.parents.append(len(self.parents))
+        self.plant_types.append(plant_type)
+        self.areas.append(0)
+        self.perimeters.append(0)
+        self.number_of_sides.append(0)
+        return len(self.parents) - 1
+
+    def find(self, region: int) -> int:
+        while self.parents[region] != region:
+            self.parents[region] = self.parents[self.parents[region]]
+            region = self.parents[region]
+        return region
+
+    def union(self, region: int, other_region: int) -> int:
+        region = self.find(region)
+        other_region = self.find(other_region)
+        if region == other_region:
+            return region
+        self.parents[other_region] = region
+        self.areas[region] += self.areas[other_region]
+        self.perimeters[region] += self.perimeters[other_region]
+        self.number_of_sides[region] += self.number_of_sides[other_region]
+        return region
+
+    def get_statistics(self, region: int) -> Tuple[str, int, int, int]:
+        return (
+            self.plant_types[region],
+            self.areas[region],
+            self.perimeters[region],
+            self.number_of_sides[region],
+        )
+
+
+def stream_region_statistics(
+    rows: Iterable[str],
+) -> Iterator[Tuple[str, int, int, int]]:
+    # Only the regions of the previous and the current row are kept. A region is finished as soon as a row does not touch it anymore.
+    regions = RegionsOfTwoRows()
+    upper_plants = []
+    upper_regions = []
+    for row in itertools.chain(rows, [None]):
+        lower_plants = [] if row is None else list(row.strip())
+        lower_regions = []
+        for y, plant_type in enumerate(lower_plants):
+            region = None
+            if y > 0 and lower_plants[y - 1] == plant_type:
+                region = lower_regions[y - 1]
+            if y < len(upper_plants) and upper_plants[y] == plant_type:
+                if region is None:
+                    region = upper_regions[y]
+                else:
+                    region = regions.union(region, upper_regions[y])
+            if region is None:
+                region = regions.add_region(plant_type)
+            lower_regions.append(region)
+            regions.areas[regions.find(region)] += 1
+
+        # Same rules as calculate_statistics_by_corners, but by plant type as the regions of diagonal plots are not known yet.
+        # Two diagonal plots of one plant type are two corners of a single region or one corner each of two regions.
+        number_of_columns = max(len(upper_plants), len(lower_plants))
+        upper_padding = [None] * (number_of_columns + 1 - len(upper_plants))
+        lower_padding = [None] * (number_of_columns + 1 - len(lower_plants))
+        padded_upper_plants = [None] + upper_plants + upper_padding
+        padded_lower_plants = [None] + lower_plants + lower_padding
+        padded_upper_regions = [None] + upper_regions + upper_padding
+        padded_lower_regions = [None] + lower_regions + lower_padding
+        for y in range(number_of_columns + 1):
+            plants = [
+                padded_upper_plants[y],
+                padded_upper_plants[y + 1],
+                padded_lower_plants[y],
+                padded_lower_plants[y + 1],
+            ]
+            plots = [
+                padded_upper_regions[y],
+                padded_upper_regions[y + 1],
+                padded_lower_regions[y],
+                padded_lower_regions[y + 1],
+            ]
+            if plants[1] != plants[3]:
+                for i in [1, 3]:
+                    if plots[i] is not None:
+                        regions.perimeters[regions.find(plots[i])] += 1
+            if plants[2] != plants[3]:
+                for i in [2, 3]:
+                    if plots[i] is not None:
+                        regions.perimeters[regions.find(plots[i])] += 1
+            for plant_type in set(plants):
+                if plant_type is None:
+                    continue
+                covered_plots = [i for i in range(4) if plants[i] == plant_type]
+                if len(covered_plots) == 1 or len(covered_plots) == 3:
+                    regions.number_of_sides[regions.find(plots[covered_plots[0]])] += 1
+                elif covered_plots == [0, 3] or covered_plots == [1, 2]:
+                    for i in covered_plots:
+                        regions.number_of_sides[regions.find(plots[i])] += 1
+
+        lower_roots = {regions.find(region) for region in lower_regions}
+        for root in dict.fromkeys(regions.find(region) for region in upper_regions):
+            if root not in lower_roots:
+                yield regions.get_statistics(root)
+
+        # Start over with only the regions of the current row to keep the memory bounded by the width of the map.
+        remaining_regions = RegionsOfTwoRows()
+        new_regions = {}
+        for root in dict.fromkeys(regions.find(region) for region in lower_regions):
+            new_region = remaining_regions.add_region(regions.plant_types[root])
+            remaining_regions.areas[new_region] = regions.areas[root]
+            remaining_regions.perimeters[new_region] = regions.perimeters[root]
+            remaining_regions.number_of_sides[new_region] = regions.number_of_sides[
+                root
+            ]
+            new_regions[root] = new_region
+        upper_regions = [new_regions[regions.find(region)] for region in lower_regions]
+        upper_plants = lower_plants
+        regions = remaining_regions
+
+
+def calculate_statistics_by_streaming(
+    map: List[List[str]],
+) -> Tuple[List[int], List[int], List[int]]:
+    statistics = list(stream_region_statistics("".join(row) for row in map))
+    return (
+        [area for _, area, _, _ in statistics],
+        [perimeter for _, _, perimeter, _ in statistics],
+        [sides for _, _, _, sides in statistics],
+    )
+
 
+engines = {
+    "regions": calculate_statistics_of_region_objects,
+    "corners": calculate_statistics_by_corners,
+    "numpy": calculate_statistics_with_numpy,
+    "streaming": calculate_statistics_by_streaming,
+}
 
-def solve_second_part(regions: List[Region]) -> int:
-    price_for_fences = 0
-    for region in regions:
-        if region.plant_type == "O":
-            region.display()
-        print(f"Region has {region.calculate_number_of_edges()} edges.")
-        price_for_fences += region.calculate_number_of_edges() * region.calculate_area()
-    return price_for_fences
+
+def solve_first_part(map: List[List[str]], engine: str = "corners") -> int:
+    areas, perimeters, _ = engines[engine](map)
+    return sum(int(area) * int(perimeter) for area, perimeter in zip(areas, perimeters))
+
+
+def solve_second_part(map: List[List[str]], engine: str = "corners") -> int:
+    areas, _, number_of_sides = engines[engine](map)
+    return sum(int(area) * int(sides) for area, sides in zip(areas, number_of_sides))
 
 
 def read_input_from_file(path: str) -> str:
@@ -199,22 +522,47 @@ def read_input_from_file(path: str) -> str:
 
 
 def solve_part(
-    example_regions: List[Region],
-    regions: List[Region],
+    example_map: List[List[str]],
+    map: List[List[str]],
     solver: callable,
     given_solution: int,
 ):
-    calculated_solution = solver(example_regions)
+    calculated_solution = solver(example_map)
     assert (
         calculated_solution == given_solution
     ), f"The calculated value {calculated_solution} did not match the given solution {given_solution}."
     print("The solution for the example input was correctly reproduced.")
 
-    calculated_solution = solver(regions)
+    calculated_solution = solver(map)
     print(f"The solution to the input is {calculated_solution}")
 
 
 def main():
+    argument_parser = argparse.ArgumentParser()
+    argument_parser.add_argument(
+        "--engine",
+        choices=engines.keys(),
+        default="corners",
+        help="Algorithm used for calculating area, perimeter and sides of the regions.",
+    )
+    argument_parser.add_argument(
+        "--stream",
+        help="Only calculate the prices for the garden in this file, reading it row by row.",
+    )
+    arguments = argument_parser.parse_args()
+
+    if arguments.stream is not None:
+        price_for_fences = 0
+        price_for_fences_with_discount = 0
+        with open(arguments.stream) as file:
+            rows = (line for line in file if line.strip())
+            for _, area, perimeter, sides in stream_region_statistics(rows):
+                price_for_fences += area * perimeter
+                price_for_fences_with_discount += area * sides
+        print(f"The price for the fences is {price_for_fences}")
+        print(f"The price with bulk discount is {price_for_fences_with_discount}")
+        return
+
     print("Reading inputs...")
     example_input = read_input_from_file("example.txt")
     input = read_input_from_file("input.txt")
@@ -222,19 +570,20 @@ def main():
         return
     example_map = parse(example_input)
     map = parse(input)
-    example_regions = find_regions(example_map)
-    regions = find_regions(map)
 
     print("\nSolving first part...")
     solve_part(
-        example_regions, regions, solve_first_part, given_example_solution_of_first_part
+        example_map,
+        map,
+        functools.partial(solve_first_part, engine=arguments.engine),
+        given_example_solution_of_first_part,
     )
 
     print("\nSolving second part...")
     solve_part(
-        example_regions,
-        regions,
-        solve_second_part,
+        example_map,
+        map,
+        functools.partial(solve_second_part, engine=arguments.engine),
         given_example_solution_of_second_part,
     )
 
@@ -1,234 +1,233 @@
+import argparse
+import functools
+import itertools
 import pathlib
-from typing import List, Tuple
+from typing import Callable, Dict, List, Tuple
 
 # The expected solutions for the example input of the first and second part of the puzzle used for checking the implemented algorithm.
 given_example_solution_of_first_part = 10092
 given_example_solution_of_second_part = 9021
 
 
+wall_tile, free_tile, robot_tile, box_tile, left_box_tile, right_box_tile = b"#.@O[]"
+
+
 class Warehouse:
+    gps_tile = box_tile
+
     def __init__(self, warehouse: str):
-        self.warehouse = list(list(row) for row in warehouse.split("\n"))
+        rows = warehouse.split("\n")
+        self.width = len(rows[0])
+        self.warehouse = bytearray("".join(rows), "ascii")
+        self.offsets = translate_directions(self.width)
         self.robot_position = self.find_robot_position()
+        # Updated with every moved box, so the current GPS can be queried at any time without scanning the warehouse.
+        self.gps = self.calculate_gps()
 
     def __str__(self) -> str:
-        return "\n".join("".join(row) for row in self.warehouse)
-
-    def find_robot_position(self) -> Tuple[int, int]:
-        for x, row in enumerate(self.warehouse):
-            for y, cell in enumerate(row):
-                if cell == "@":
-                    return x, y
-        raise ValueError("No robot found in the warehouse.")
-
-    def move_box(self, position: Tuple[int, int], direction: str) -> bool:
-        x, y = position
-        dx, dy = translate_direction(direction)
-
-        if self.warehouse[x + dx][y + dy] == ".":
-            self.warehouse[x][y] = "."
-            self.warehouse[x + dx][y + dy] = "O"
-            return True
-        if self.warehouse[x + dx][y + dy] == "#":
-            return False
-        if self.warehouse[x + dx][y + dy] == "O":
-            if self.move_box((x + dx, y + dy), direction):
-                self.warehouse[x][y] = "."
-                self.warehouse[x + dx][y + dy] = "O"
-                return True
+        return "\n".join(
+            self.warehouse[i : i + self.width].decode()
+            for i in range(0, len(self.warehouse), self.width)
+        )
+
+    def find_robot_position(self) -> int:
+        robot_position = self.warehouse.find(robot_tile)
+        if robot_position < 0:
+            raise ValueError("No robot found in the warehouse.")
+        return robot_position
+
+    def move_box(self, position: int, offset: int) -> bool:
+        # Pushing a row of boxes only fills the first free tile behind it and frees the first box.
+        end = position
+        while self.warehouse[end] == box_tile:
+            end += offset
+        if self.warehouse[end] == wall_tile:
             return False
-        raise Exception(f"Invalid state reached.")
+        if self.warehouse[end] != free_tile:
+            raise Exception(f"Invalid state reached.")
+        self.warehouse[end] = box_tile
+        self.warehouse[position] = free_tile
+        self.gps += self.get_gps_coordinate(end) - self.get_gps_coordinate(position)
+        return True
 
     def move_robot(self, direction: str) -> bool:
-        x, y = self.robot_position
-        dx, dy = translate_direction(direction)
+        offset = self.offsets[direction]
+        target = self.robot_position + offset
+        tile = self.warehouse[target]
 
-        if self.warehouse[x + dx][y + dy] == "#":
+        if tile == wall_tile:
             return False
-        if self.warehouse[x + dx][y + dy] == ".":
-            self.warehouse[x][y] = "."
-            self.warehouse[x + dx][y + dy] = "@"
-            self.robot_position = (x + dx, y + dy)
-            return True
-        if self.warehouse[x + dx][y + dy] == "O":
-            if self.move_box((x + dx, y + dy), direction):
-                self.warehouse[x][y] = "."
-                self.warehouse[x + dx][y + dy] = "@"
-                self.robot_position = (x + dx, y + dy)
-                return True
+        if tile == box_tile and not self.move_box(target, offset):
             return False  # if the box could not be moved -> don't move the robot
-        raise Exception(f"Invalid state reached.")
+        if tile != free_tile and tile != box_tile:
+            raise Exception(f"Invalid state reached.")
+        self.warehouse[self.robot_position] = free_tile
+        self.warehouse[target] = robot_tile
+        self.robot_position = target
+        return True
+
+    def get_line_in_front_of_robot(self, offset: int) -> Tuple[bytes, int]:
+        # The tiles from the robot in walking direction, together with the index of the next wall. Horizontal lines are
+        # cut at the end of the row, vertical lines have at most one tile per row.
+        row_start = self.robot_position - self.robot_position % self.width
+        if offset == 1:
+            line = self.warehouse[self.robot_position : row_start + self.width]
+        elif offset == -1:
+            line = self.warehouse[row_start : self.robot_position + 1][::-1]
+        else:
+            line = self.warehouse[self.robot_position :: offset]
+        wall = line.find(wall_tile)
+        if wall < 0:
+            raise Exception("No wall found in front of the robot.")
+        return line, wall
+
+    def move_robot_repeatedly(self, direction: str, count: int) -> int:
+        # Every step frees the robot's tile and removes the first free tile in front of it, so the tiles up to the
+        # last consumed free tile are rewritten with a single slice assignment.
+        if count == 1:
+            # A single move is cheaper without building the line.
+            start = self.robot_position
+            self.move_robot(direction)
+            return int(self.robot_position != start)
+        offset = self.offsets[direction]
+        line, wall = self.get_line_in_front_of_robot(offset)
+        free_positions = []
+        while len(free_positions) < count:
+            free_position = line.find(
+                free_tile, free_positions[-1] + 1 if free_positions else 1, wall
+            )
+            if free_position < 0:
+                break
+            free_positions.append(free_position)
+        number_of_steps = len(free_positions)
+        if number_of_steps == 0:
+            return 0
+        line = line[: free_positions[-1] + 1]
+        moved_line = b"." * number_of_steps + b"@" + line[1:].replace(b".", b"")
+        self.warehouse[
+            self.robot_position : self.robot_position + len(line) * offset : offset
+        ] = moved_line
+
+        # The boxes between two consumed free tiles are pushed once for every consumed free tile in front of them.
+        gps_per_step = self.get_gps_coordinate(
+            self.robot_position + offset
+        ) - self.get_gps_coordinate(self.robot_position)
+        previous_free_position = 0
+        for number_of_pushes, free_position in zip(
+            range(number_of_steps, 0, -1), free_positions
+        ):
+            number_of_boxes = line.count(
+                self.gps_tile, previous_free_position + 1, free_position
+            )
+            self.gps += gps_per_step * number_of_pushes * number_of_boxes
+            previous_free_position = free_position
+        self.robot_position += number_of_steps * offset
+        return number_of_steps
+
+    def get_gps_coordinate(self, position: int) -> int:
+        y, x = divmod(position, self.width)
+        return x + 100 * y
 
     def calculate_gps(self) -> int:
         gps = 0
-        for y, row in enumerate(self.warehouse):
-            for x, cell in enumerate(row):
-                if cell == "O":
-                    gps += x + 100 * y
+        position = self.warehouse.find(self.gps_tile)
+        while position >= 0:
+            gps += self.get_gps_coordinate(position)
+            position = self.warehouse.find(self.gps_tile, position + 1)
         return gps
 
 
+larger_tiles = {
+    wall_tile: b"##",
+    box_tile: b"[]",
+    free_tile: b"..",
+    robot_tile: b"@.",
+}
+
+
 class WarehouseWithLargerBoxes(Warehouse):
+    gps_tile = left_box_tile
+
     def __init__(self, warehouse: Warehouse):
-        self.warehouse = []
-        for row in warehouse.warehouse:
-            self.warehouse.append([])
-            for cell in row:
-                if cell == "#":
-                    self.warehouse[-1].extend(["#", "#"])
-                elif cell == "O":
-                    self.warehouse[-1].extend(["[", "]"])
-                elif cell == ".":
-                    self.warehouse[-1].extend([".", "."])
-                elif cell == "@":
-                    self.warehouse[-1].extend(["@", "."])
+        self.width = 2 * warehouse.width
+        self.warehouse = bytearray()
+        for tile in warehouse.warehouse:
+            if tile not in larger_tiles:
+                raise ValueError(f'Invalid tile "{chr(tile)}" in original warehouse.')
+            self.warehouse += larger_tiles[tile]
+        self.offsets = translate_directions(self.width)
+        self.robot_position = 2 * warehouse.robot_position
+        self.gps = self.calculate_gps()
+
+    def plan_push(self, position: int, offset: int) -> List[int] | None:
+        # Breadth-first search over the boxes touched by the push, every box is visited once even if several boxes push it.
+        boxes = [position]
+        planned_boxes = {position}
+        for box in boxes:
+            for tile_position in [box + offset, box + 1 + offset]:
+                if tile_position == box or tile_position == box + 1:
+                    continue  # The box itself when pushed horizontally.
+                tile = self.warehouse[tile_position]
+                if tile == wall_tile:
+                    return None
+                if tile == left_box_tile:
+                    next_box = tile_position
+                elif tile == right_box_tile:
+                    next_box = tile_position - 1
                 else:
-                    raise ValueError(f'Invalid tile "{cell}" in original warehouse.')
-        self.robot_position = (
-            warehouse.robot_position[0],
-            2 * warehouse.robot_position[1],
-        )
-
-    def can_move_box(self, position: Tuple[int, int], direction: str) -> bool:
-        x, y = position
-        dx, dy = translate_direction(direction)
-        if self.warehouse[x][y] != "[":
+                    continue
+                if next_box not in planned_boxes:
+                    planned_boxes.add(next_box)
+                    boxes.append(next_box)
+        return boxes
+
+    def move_box(self, position: int, offset: int) -> bool:
+        if self.warehouse[position] != left_box_tile:
             raise ValueError(
-                f"can_move_box should only be called on a box position ({self.warehouse[x][y]})."
+                f"move_box should only be called on a box position ({chr(self.warehouse[position])})."
             )
-
-        if direction == "^" or direction == "v":
-            if (
-                self.warehouse[x + dx][y] == "."
-                and self.warehouse[x + dx][y + 1] == "."
-            ):
-                return True
-            if self.warehouse[x + dx][y] == "#" or self.warehouse[x + dx][y + 1] == "#":
-                return False
-            if self.warehouse[x + dx][y] == "[":
-                return self.can_move_box((x + dx, y), direction)
-            if (
-                self.warehouse[x + dx][y] == "]"
-                and self.warehouse[x + dx][y + 1] == "["
-            ):
-                return self.can_move_box(
-                    (x + dx, y - 1), direction
-                ) and self.can_move_box((x + dx, y + 1), direction)
-            if self.warehouse[x + dx][y] == "]":
-                return self.can_move_box((x + dx, y - 1), direction)
-            if self.warehouse[x + dx][y + 1] == "[":
-                return self.can_move_box((x + dx, y + 1), direction)
-            raise Exception(f"Invalid state reached.")
-        if direction == "<":
-            if self.warehouse[x][y - 1] == ".":
-                return True
-            if self.warehouse[x][y - 1] == "#":
-                return False
-            if self.warehouse[x][y - 1] == "]":
-                return self.can_move_box((x, y - 2), direction)
-            raise Exception(f"Invalid state reached.")
-        if direction == ">":
-            if self.warehouse[x][y + 2] == ".":
-                return True
-            if self.warehouse[x][y + 2] == "#":
-                return False
-            if self.warehouse[x][y + 2] == "[":
-                return self.can_move_box((x, y + 2), direction)
-            raise Exception(f"Invalid state reached.")
-        raise Exception(f"Invalid state reached.")
-
-    def move_box(self, position: Tuple[int, int], direction: str) -> None:
-        x, y = position
-        dx, dy = translate_direction(direction)
-
-        if self.warehouse[x][y] != "[":
-            raise ValueError(
-                f"move_box should only be called on a box position ({self.warehouse[x][y]})."
+        boxes = self.plan_push(position, offset)
+        if boxes is None:
+            return False
+        for box in boxes:
+            self.warehouse[box : box + 2] = b".."
+        for box in boxes:
+            self.warehouse[box + offset : box + offset + 2] = b"[]"
+            self.gps += self.get_gps_coordinate(box + offset) - self.get_gps_coordinate(
+                box
             )
-
-        if direction == "^" or direction == "v":
-            if self.warehouse[x + dx][y] == "#" or self.warehouse[x + dx][y + 1] == "#":
-                raise ValueError("Box could not be moved.")
-            if self.warehouse[x + dx][y] == "[":
-                self.move_box((x + dx, y), direction)
-            if self.warehouse[x + dx][y] == "]":
-                self.move_box((x + dx, y - 1), direction)
-            if self.warehouse[x + dx][y + 1] == "[":
-                self.move_box((x + dx, y + 1), direction)
-            self.warehouse[x][y] = "."
-            self.warehouse[x][y + 1] = "."
-            self.warehouse[x + dx][y] = "["
-            self.warehouse[x + dx][y + 1] = "]"
-            return
-
-        if direction == "<":
-            if self.warehouse[x][y - 1] == "#":
-                raise ValueError("Box could not be moved.")
-            if self.warehouse[x][y - 1] == "]":
-                self.move_box((x, y - 2), direction)
-            self.warehouse[x][y - 1] = "["
-            self.warehouse[x][y] = "]"
-            self.warehouse[x][y + 1] = "."
-            return
-
-        if direction == ">":
-            if self.warehouse[x][y + 2] == "#":
-                raise ValueError("Box could not be moved.")
-            if self.warehouse[x][y + 2] == "[":
-                self.move_box((x, y + 2), direction)
-            self.warehouse[x][y] = "."
-            self.warehouse[x][y + 1] = "["
-            self.warehouse[x][y + 2] = "]"
-            return
-
-        raise Exception(f"Invalid state reached.")
+        return True
 
     def move_robot(self, direction: str) -> None:
-        x, y = self.robot_position
-        dx, dy = translate_direction(direction)
+        offset = self.offsets[direction]
+        target = self.robot_position + offset
+        tile = self.warehouse[target]
 
-        if self.warehouse[x + dx][y + dy] == "#":
-            return
-        if self.warehouse[x + dx][y + dy] == ".":
-            self.warehouse[x][y] = "."
-            self.warehouse[x + dx][y + dy] = "@"
-            self.robot_position = (x + dx, y + dy)
+        if tile == wall_tile:
             return
-        if self.warehouse[x + dx][y + dy] == "[":
-            if self.can_move_box((x + dx, y + dy), direction):
-                self.move_box((x + dx, y + dy), direction)
-                self.warehouse[x][y] = "."
-                self.warehouse[x + dx][y + dy] = "@"
-                self.robot_position = (x + dx, y + dy)
-            return
-        if self.warehouse[x + dx][y + dy] == "]":
-            if self.can_move_box((x + dx, y - 1 + dy), direction):
-                self.move_box((x + dx, y - 1 + dy), direction)
-                self.warehouse[x][y] = "."
-                self.warehouse[x + dx][y + dy] = "@"
-                self.robot_position = (x + dx, y + dy)
-            return
-        raise Exception(f"Invalid state reached.")
+        if tile == left_box_tile or tile == right_box_tile:
+            box_position = target if tile == left_box_tile else target - 1
+            if not self.move_box(box_position, offset):
+                return
+        elif tile != free_tile:
+            raise Exception(f"Invalid state reached.")
+        self.warehouse[self.robot_position] = free_tile
+        self.warehouse[target] = robot_tile
+        self.robot_position = target
 
-    def calculate_gps(self) -> int:
-        gps = 0
-        for y, row in enumerate(self.warehouse):
-            for x, cell in enumerate(row):
-                if cell == "[":
-                    gps += x + 100 * y
-        return gps
+    def move_robot_repeatedly(self, direction: str, count: int) -> int:
+        if direction == "<" or direction == ">":
+            return super().move_robot_repeatedly(direction, count)
+        # Pushing large boxes vertically can spread out, so these moves are executed one by one.
+        start = self.robot_position
+        for _ in range(count):
+            self.move_robot(direction)
+        return abs(self.robot_position - start) // self.width
 
 
-def translate_direction(direction: str) -> Tuple[int, int]:
-    if direction == "^":
-        return -1, 0
-    if direction == "v":
-        return 1, 0
-    if direction == "<":
-        return 0, -1
-    if direction == ">":
-        return 0, 1
-    raise ValueError(f"Invalid direction {direction}.")
+def translate_directions(width: int) -> Dict[str, int]:
+    # Offsets of the neighbouring tile in the flat warehouse with rows of the given width.
+    return {"^": -width, "v": width, "<": -1, ">": 1}
 
 
 def parse_warehouse(input: str) -> Warehouse:
@@ -240,23 +239,80 @@ def parse(input: str) -> Tuple[Warehouse, str]:
     return parse_warehouse(warehouse_input), move_input.replace("\n", "").strip()
 
 
-def solve_first_part(warehouse: Warehouse, move_sequence: List[str]) -> int:
-    for move in move_sequence:
+def execute_moves_step_by_step(
+    warehouse: Warehouse,
+    move_sequence: str,
+    report_gps: Callable[[int, int], None] | None = None,
+    report_interval: int = 0,
+) -> None:
+    for number_of_moves, move in enumerate(move_sequence, 1):
         warehouse.move_robot(move)
+        if report_gps is not None and number_of_moves % report_interval == 0:
+            report_gps(number_of_moves, warehouse.gps)
+
+
+def compress_moves(move_sequence: str) -> List[Tuple[str, int]]:
+    return [(move, len(list(run))) for move, run in itertools.groupby(move_sequence)]
+
+
+def execute_moves_in_runs(
+    warehouse: Warehouse,
+    move_sequence: str,
+    report_gps: Callable[[int, int], None] | None = None,
+    report_interval: int = 0,
+) -> None:
+    number_of_moves = 0
+    for move, count in compress_moves(move_sequence):
+        if report_gps is None:
+            warehouse.move_robot_repeatedly(move, count)
+            continue
+        # Runs are split at the reporting points.
+        while count > 0:
+            part_of_run = min(
+                count, report_interval - number_of_moves % report_interval
+            )
+            warehouse.move_robot_repeatedly(move, part_of_run)
+            count -= part_of_run
+            number_of_moves += part_of_run
+            if number_of_moves % report_interval == 0:
+                report_gps(number_of_moves, warehouse.gps)
+
+
+engines = {
+    "steps": execute_moves_step_by_step,
+    "runs": execute_moves_in_runs,
+}
+
+
+def solve_first_part(
+    warehouse: Warehouse,
+    move_sequence: str,
+    engine: str = "steps",
+    report_gps: Callable[[int, int], None] | None = None,
+    report_interval: int = 0,
+) -> int:
+    engines[engine](warehouse, move_sequence, report_gps, report_interval)
 
     print(warehouse)
-    return warehouse.calculate_gps()
+    return warehouse.gps
 
 
 def solve_second_part(
-    warehouse: WarehouseWithLargerBoxes, move_sequence: List[str]
+    warehouse: WarehouseWithLargerBoxes,
+    move_sequence: str,
+    engine: str = "steps",
+    report_gps: Callable[[int, int], None] | None = None,
+    report_interval: int = 0,
 ) -> int:
     print(warehouse)
-    for move in move_sequence:
-        warehouse.move_robot(move)
+    engines[engine](warehouse, move_sequence, report_gps, report_interval)
 
     print(warehouse)
-    return warehouse.calculate_gps()
+    return warehouse.gps
+
+
+def print_gps(number_of_moves: int, gps: int) -> None:
+    print(f"GPS after {number_of_moves} moves: {gps}")
 
 
 def read_input_from_file(path: str) -> str | None:
@@ -307,6 +363,22 @@ def solve_part(
 
 
 def main():
+    argument_parser = argparse.ArgumentParser()
+    argument_parser.add_argument(
+        "--engine",
+        choices=engines.keys(),
+        default="steps",
+        help="Execute the moves one by one or in runs of the same direction.",
+    )
+    argument_parser.add_argument(
+        "--gps-interval",
+        type=int,
+        default=0,
+        help="Print the current GPS every this many moves.",
+    )
+    arguments = argument_parser.parse_args()
+    report_gps = print_gps if arguments.gps_interval > 0 else None
+
     print("Reading inputs...")
     example_input = read_input_from_file("example.txt")
     input = read_input_from_file("input.txt")
@@ -325,7 +397,12 @@ def main():
         example_move_sequence,
         warehouse,
         move_sequence,
-        solve_first_part,
+        functools.partial(
+            solve_first_part,
+            engine=arguments.engine,
+            report_gps=report_gps,
+            report_interval=arguments.gps_interval,
+        ),
         given_example_solution_of_first_part,
     )
 
@@ -335,7 +412,12 @@ def main():
         example_move_sequence,
         warehouse_with_larger_boxes,
         move_sequence,
-        solve_second_part,
+        functools.partial(
+            solve_second_part,
+            engine=arguments.engine,
+            report_gps=report_gps,
+            report_interval=arguments.gps_interval,
+        ),
         given_example_solution_of_second_part,
     )
 
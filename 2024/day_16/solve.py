@@ -1,7 +1,12 @@
+import argparse
+import functools
 import pathlib
-from typing import List
-import copy
-import sys
+import time
+from typing import Dict, List, Tuple
+import heapq
+import itertools
+from collections import defaultdict
+from array import array
 
 # The expected solutions for the example input of the first and second part of the puzzle used for checking the implemented algorithm.
 given_example_solution_of_first_part = 7036
@@ -13,9 +18,23 @@ class Maze:
         self.maze = list(list(line) for line in maze.strip().split("\n"))
         self.start = self.find_start()
         self.end = self.find_end()
-        self.minimal_paths = [
-            [None for _ in range(len(self.maze[0]))] for _ in range(len(self.maze))
-        ]
+        # Flat representation surrounded by an additional layer of walls, so no step can leave the maze.
+        self.width = len(self.maze[0]) + 2
+        self.walls = bytearray([1] * self.width)
+        for line in self.maze:
+            self.walls += bytearray([1] + [cell == "#" for cell in line] + [1])
+        self.walls += bytearray([1] * self.width)
+        self.step_offsets = [1, self.width, -1, -self.width]
+        self.corridor_graph = None
+
+    def get_corridor_graph(self):
+        # Built once and reused for all queries on this maze.
+        if self.corridor_graph is None:
+            self.corridor_graph = CorridorGraph(self)
+        return self.corridor_graph
+
+    def get_cell(self, x: int, y: int) -> int:
+        return (y + 1) * self.width + x + 1
 
     def find_start(self) -> tuple[int, int]:
         for y, line in enumerate(self.maze):
@@ -35,110 +54,366 @@ class Maze:
         return "\n".join("".join(line) for line in self.maze)
 
 
-class Path:
-    def __init__(self, movements: List[str], x: int, y: int, length: int):
-        self.movements = movements
-        self.x = x
-        self.y = y
-        self.length = length
-
-    def extend(self, movement: str, maze) -> bool:
-        x, y = self.x, self.y
-        if movement == "^":
-            y -= 1
-        elif movement == "v":
-            y += 1
-        elif movement == "<":
-            x -= 1
-        elif movement == ">":
-            x += 1
-
-        if maze.maze[y][x] == "#":
-            return False
-
-        self.x, self.y = x, y
-        last_movement = self.movements[-1]
-        self.movements.append(movement)
-        if last_movement == movement:
-            self.length += 1
-        else:
-            self.length += 1001
-
-        if (  # Exclude paths that are already longer than the shortest path.
-            maze.minimal_paths[maze.end[1]][maze.end[0]] is not None
-            and maze.minimal_paths[maze.end[1]][maze.end[0]][0].length < self.length
-        ):
-            return False
-
-        if maze.minimal_paths[y][x] is None:
-            maze.minimal_paths[y][x] = [self]
-            return True
-        minimal_path_length = min(path.length for path in maze.minimal_paths[y][x])
-        if (
-            minimal_path_length + 1000 < self.length
-        ):  # If the new path is more than 1000 steps longer than the shortest path, it can be excluded (better orientation doesn't suffice).
-            return False
-        for path in maze.minimal_paths[y][x]:
-            if path.movements[-1] == movement:
-                if path.length < self.length:
-                    return False
-                if path.length > self.length:
-                    maze.minimal_paths[y][x].remove(path)
-            else:
-                if path.length > self.length + 1000:
-                    maze.minimal_paths[y][x].remove(path)
-        maze.minimal_paths[y][x].append(self)
-        return True
-
-
 def parse(input: str) -> Maze:
     return Maze(input)
 
 
-def get_direction(movement: str) -> tuple[int, int]:
-    if movement == "^":
-        return (0, -1)
-    elif movement == "v":
-        return (0, 1)
-    elif movement == "<":
-        return (-1, 0)
-    elif movement == ">":
-        return (1, 0)
-    raise ValueError(f"Invalid movement: {movement}")
-
-
-def move(maze: Maze, path: Path) -> Path:
-    for movement in ["^", "v", "<", ">"]:
-        direction = get_direction(movement)
-        x, y = path.x + direction[0], path.y + direction[1]
-        if x < 0 or x >= len(maze.maze[0]) or y < 0 or y >= len(maze.maze):
+# The headings are ordered clockwise like Maze.step_offsets, so a turn changes the heading by one.
+headings = [">", "v", "<", "^"]
+unreachable = 2**62
+
+
+def calculate_distances(
+    maze: Maze, start_states: List[int], backwards: bool = False
+) -> array:
+    # Dijkstra over the states 4 * cell + heading, stepping costs 1 and turning by 90 degrees costs 1000.
+    # Backwards the steps are reversed, which gives the distances from every state to the start states.
+    distances = array("q", [unreachable]) * (4 * len(maze.walls))
+    queue = []
+    for state in start_states:
+        distances[state] = 0
+        heapq.heappush(queue, (0, state))
+    while queue:
+        distance, state = heapq.heappop(queue)
+        if distance > distances[state]:
             continue
-        new_path = copy.deepcopy(path)
-        if new_path.extend(movement, maze):
-            move(maze, new_path)
-
+        cell = state >> 2
+        heading = state & 3
+        if backwards:
+            next_cell = cell - maze.step_offsets[heading]
+        else:
+            next_cell = cell + maze.step_offsets[heading]
+        if not maze.walls[next_cell]:
+            next_state = 4 * next_cell + heading
+            if distance + 1 < distances[next_state]:
+                distances[next_state] = distance + 1
+                heapq.heappush(queue, (distance + 1, next_state))
+        for next_state in [
+            4 * cell + ((heading + 1) & 3),
+            4 * cell + ((heading - 1) & 3),
+        ]:
+            if distance + 1000 < distances[next_state]:
+                distances[next_state] = distance + 1000
+                heapq.heappush(queue, (distance + 1000, next_state))
+    return distances
+
+
+def estimate_no_remaining_score(maze: Maze, state: int, end_cell: int) -> int:
+    return 0
+
+
+def estimate_remaining_score(maze: Maze, state: int, end_cell: int) -> int:
+    # Exact score in a maze without walls: the Manhattan distance and one turn if the end is beside the
+    # walking direction, two turns if it is behind. It never overestimates, so A* finds the lowest score.
+    cell = state >> 2
+    heading = state & 3
+    dy, dx = divmod(end_cell, maze.width)
+    y, x = divmod(cell, maze.width)
+    dx -= x
+    dy -= y
+    ahead, beside = [(dx, dy), (dy, dx), (-dx, dy), (-dy, dx)][heading]
+    if ahead < 0:
+        return abs(dx) + abs(dy) + 2000
+    if beside != 0:
+        return abs(dx) + abs(dy) + 1000
+    return abs(dx) + abs(dy)
+
+
+heuristics = {
+    "dijkstra": estimate_no_remaining_score,
+    "astar": estimate_remaining_score,
+}
+
+
+def find_lowest_score(
+    maze: Maze, start_state: int, end_cell: int, heuristic: callable
+) -> Tuple[int, int]:
+    # Returns the lowest score and the number of expanded states.
+    distances = array("q", [unreachable]) * (4 * len(maze.walls))
+    distances[start_state] = 0
+    queue = [(heuristic(maze, start_state, end_cell), 0, start_state)]
+    number_of_expanded_states = 0
+    while queue:
+        _, distance, state = heapq.heappop(queue)
+        if distance > distances[state]:
+            continue
+        number_of_expanded_states += 1
+        cell = state >> 2
+        if cell == end_cell:
+            return distance, number_of_expanded_states
+        heading = state & 3
+        next_states = [
+            (4 * cell + ((heading + 1) & 3), distance + 1000),
+            (4 * cell + ((heading - 1) & 3), distance + 1000),
+        ]
+        next_cell = cell + maze.step_offsets[heading]
+        if not maze.walls[next_cell]:
+            next_states.append((4 * next_cell + heading, distance + 1))
+        for next_state, next_distance in next_states:
+            if next_distance < distances[next_state]:
+                distances[next_state] = next_distance
+                heapq.heappush(
+                    queue,
+                    (
+                        next_distance + heuristic(maze, next_state, end_cell),
+                        next_distance,
+                        next_state,
+                    ),
+                )
+    return unreachable, number_of_expanded_states
+
+
+class CorridorEdge:
+    def __init__(self, start_cell: int, tiles: List[int], tile_headings: List[int]):
+        # The tiles are covered after leaving the start cell, the last one is the next node.
+        # Every tile is stored with the heading it is entered with.
+        self.start_cell = start_cell
+        self.tiles = tiles
+        self.tile_headings = tile_headings
+        self.start_state = 4 * start_cell + tile_headings[0]
+        self.end_state = 4 * tiles[-1] + tile_headings[-1]
+        self.number_of_steps = len(tiles)
+        self.number_of_turns = sum(
+            heading != next_heading
+            for heading, next_heading in zip(tile_headings, tile_headings[1:])
+        )
+        self.score = self.number_of_steps + 1000 * self.number_of_turns
+
+    def split(self, index: int) -> Tuple["CorridorEdge", "CorridorEdge"]:
+        return (
+            CorridorEdge(
+                self.start_cell,
+                self.tiles[: index + 1],
+                self.tile_headings[: index + 1],
+            ),
+            CorridorEdge(
+                self.tiles[index],
+                self.tiles[index + 1 :],
+                self.tile_headings[index + 1 :],
+            ),
+        )
 
-def solve_first_part(maze: Maze) -> int:
-    current_position = maze.start
-    move(maze, Path([">"], current_position[0], current_position[1], 0))
-    return maze.minimal_paths[maze.end[1]][maze.end[0]][0].length
 
+class CorridorGraph:
+    def __init__(self, maze: Maze):
+        # Corridor tiles have exactly two open neighbours, all other open tiles are junctions.
+        self.maze = maze
+        self.junctions = {
+            cell
+            for cell in range(len(maze.walls))
+            if not maze.walls[cell]
+            and sum(not maze.walls[cell + offset] for offset in maze.step_offsets) != 2
+        }
+        self.edges = {}
+        for junction in list(self.junctions):
+            self.add_corridors_from(junction)
+        # Closed loops without any junction get one of their tiles as a node.
+        covered_tiles = set(self.junctions)
+        for edge in self.edges.values():
+            covered_tiles.update(edge.tiles)
+        for cell in range(len(maze.walls)):
+            if not maze.walls[cell] and cell not in covered_tiles:
+                self.junctions.add(cell)
+                for edge in self.add_corridors_from(cell):
+                    covered_tiles.update(edge.tiles)
+        self.reverse_edges = {edge.end_state: edge for edge in self.edges.values()}
+        # The edges passing each corridor tile, needed for queries starting or ending inside a corridor.
+        self.corridor_positions = defaultdict(list)
+        for state, edge in self.edges.items():
+            for index, tile in enumerate(edge.tiles[:-1]):
+                self.corridor_positions[tile].append((state, index))
+
+    def add_corridors_from(self, junction: int) -> List[CorridorEdge]:
+        edges = []
+        for heading, offset in enumerate(self.maze.step_offsets):
+            if not self.maze.walls[junction + offset]:
+                edge = self.follow_corridor(junction, heading)
+                self.edges[edge.start_state] = edge
+                edges.append(edge)
+        return edges
+
+    def follow_corridor(self, cell: int, heading: int) -> CorridorEdge:
+        start_cell = cell
+        tiles = []
+        tile_headings = []
+        while True:
+            cell += self.maze.step_offsets[heading]
+            tiles.append(cell)
+            tile_headings.append(heading)
+            if cell in self.junctions:
+                return CorridorEdge(start_cell, tiles, tile_headings)
+            for next_heading in [heading, (heading + 1) & 3, (heading - 1) & 3]:
+                if not self.maze.walls[cell + self.maze.step_offsets[next_heading]]:
+                    heading = next_heading
+                    break
+
+    def split_edges_at(self, cells: List[int]) -> Dict[int, CorridorEdge]:
+        # Edges replacing the edges through the given cells for a single query, the graph itself is not changed.
+        indices_per_edge = defaultdict(list)
+        for cell in cells:
+            if cell not in self.junctions:
+                for state, index in self.corridor_positions[cell]:
+                    indices_per_edge[state].append(index)
+        split_edges = {}
+        for state, indices in indices_per_edge.items():
+            edge = self.edges[state]
+            number_of_covered_tiles = 0
+            for index in sorted(set(indices)):
+                first_part, edge = edge.split(index - number_of_covered_tiles)
+                split_edges[first_part.start_state] = first_part
+                number_of_covered_tiles = index + 1
+            split_edges[edge.start_state] = edge
+        return split_edges
+
+    def calculate_distances(
+        self,
+        start_states: List[int],
+        split_edges: Dict[int, CorridorEdge],
+        end_cell: int | None = None,
+        backwards: bool = False,
+    ) -> Tuple[Dict[int, int], int]:
+        # Same search as calculate_distances on the cells, but steps follow whole corridors.
+        # Returns the distances and the number of expanded states, stopping at the end cell if one is given.
+        if backwards:
+            edges = self.reverse_edges
+            split_edges = {edge.end_state: edge for edge in split_edges.values()}
+        else:
+            edges = self.edges
+        distances = {state: 0 for state in start_states}
+        queue = [(0, state) for state in start_states]
+        heapq.heapify(queue)
+        number_of_expanded_states = 0
+        while queue:
+            distance, state = heapq.heappop(queue)
+            if distance > distances[state]:
+                continue
+            number_of_expanded_states += 1
+            cell = state >> 2
+            if cell == end_cell:
+                break
+            heading = state & 3
+            next_states = [
+                (4 * cell + ((heading + 1) & 3), distance + 1000),
+                (4 * cell + ((heading - 1) & 3), distance + 1000),
+            ]
+            edge = split_edges.get(state, edges.get(state))
+            if edge is not None:
+                next_state = edge.start_state if backwards else edge.end_state
+                next_states.append((next_state, distance + edge.score))
+            for next_state, next_distance in next_states:
+                if next_distance < distances.get(next_state, unreachable):
+                    distances[next_state] = next_distance
+                    heapq.heappush(queue, (next_distance, next_state))
+        return distances, number_of_expanded_states
+
+    def find_lowest_score(
+        self, start_cell: int, end_cell: int, start_heading: int = 0
+    ) -> Tuple[int, int]:
+        distances, number_of_expanded_states = self.calculate_distances(
+            [4 * start_cell + start_heading],
+            self.split_edges_at([start_cell, end_cell]),
+            end_cell,
+        )
+        lowest_score = min(
+            distances.get(4 * end_cell + heading, unreachable) for heading in range(4)
+        )
+        return lowest_score, number_of_expanded_states
+
+    def count_tiles_on_best_paths(
+        self, start_cell: int, end_cell: int, start_heading: int = 0
+    ) -> int:
+        split_edges = self.split_edges_at([start_cell, end_cell])
+        distances_from_start, _ = self.calculate_distances(
+            [4 * start_cell + start_heading], split_edges
+        )
+        distances_to_end, _ = self.calculate_distances(
+            [4 * end_cell + heading for heading in range(4)],
+            split_edges,
+            backwards=True,
+        )
+        lowest_score = min(
+            distances_from_start.get(4 * end_cell + heading, unreachable)
+            for heading in range(4)
+        )
+        tiles = {
+            state >> 2
+            for state, distance in distances_from_start.items()
+            if distance + distances_to_end.get(state, unreachable) == lowest_score
+        }
+        # The corridors on best paths are expanded back to their tiles.
+        for state, edge in itertools.chain(split_edges.items(), self.edges.items()):
+            if state in split_edges and edge is not split_edges[state]:
+                continue
+            if (
+                distances_from_start.get(edge.start_state, unreachable)
+                + edge.score
+                + distances_to_end.get(edge.end_state, unreachable)
+                == lowest_score
+            ):
+                tiles.update(edge.tiles)
+        return len(tiles)
+
+
+searches = list(heuristics.keys()) + ["corridors"]
+
+
+def solve_first_part(maze: Maze, search: str = "astar") -> int:
+    start_cell = maze.get_cell(*maze.start)
+    end_cell = maze.get_cell(*maze.end)
+    if search == "corridors":
+        lowest_score, number_of_expanded_states = (
+            maze.get_corridor_graph().find_lowest_score(start_cell, end_cell)
+        )
+    else:
+        lowest_score, number_of_expanded_states = find_lowest_score(
+            maze, 4 * start_cell + headings.index(">"), end_cell, heuristics[search]
+        )
+    print(f"Expanded {number_of_expanded_states} states.")
+    return lowest_score
+
+
+def compare_searches(maze: Maze) -> None:
+    start_cell = maze.get_cell(*maze.start)
+    end_cell = maze.get_cell(*maze.end)
+    for search in searches:
+        begin = time.time()
+        if search == "corridors":
+            lowest_score, number_of_expanded_states = (
+                maze.get_corridor_graph().find_lowest_score(start_cell, end_cell)
+            )
+        else:
+            lowest_score, number_of_expanded_states = find_lowest_score(
+                maze,
+                4 * start_cell + headings.index(">"),
+                end_cell,
+                heuristics[search],
+            )
+        print(
+            f"{search}: score {lowest_score}, {number_of_expanded_states} expanded states, {time.time() - begin} seconds"
+        )
 
-def solve_second_part(maze: Maze) -> int:
-    paths_to_end = maze.minimal_paths[maze.end[1]][maze.end[0]]
-    print(f"Found {len(paths_to_end)} optimal paths to the end.")
-    maze.maze[maze.start[1]][maze.start[0]] = "O"
-    for path in paths_to_end:
-        movements = path.movements[1:]
-        x, y = maze.start
-        for move in movements:
-            direction = get_direction(move)
-            x += direction[0]
-            y += direction[1]
-            maze.maze[y][x] = "O"
 
-    print(maze)
-    return sum(line.count("O") for line in maze.maze)
+def solve_second_part(maze: Maze, search: str = "astar") -> int:
+    if search == "corridors":
+        return maze.get_corridor_graph().count_tiles_on_best_paths(
+            maze.get_cell(*maze.start), maze.get_cell(*maze.end)
+        )
+    start_state = 4 * maze.get_cell(*maze.start) + headings.index(">")
+    end_cell = maze.get_cell(*maze.end)
+    distances_from_start = calculate_distances(maze, [start_state])
+    distances_to_end = calculate_distances(
+        maze, [4 * end_cell + heading for heading in range(4)], backwards=True
+    )
+    lowest_score = min(distances_from_start[4 * end_cell : 4 * end_cell + 4])
+    # A tile is on one of the best paths if the path through one of its states is as short as the best path.
+    return sum(
+        any(
+            distances_from_start[state] + distances_to_end[state] == lowest_score
+            for state in range(4 * cell, 4 * cell + 4)
+        )
+        for cell in range(len(maze.walls))
+        if not maze.walls[cell]
+    )
 
 
 def read_input_from_file(path: str) -> str | None:
@@ -182,7 +457,19 @@ def solve_part(example, input, solver: callable, given_solution: int) -> None:
 
 
 def main():
-    sys.setrecursionlimit(10000)
+    argument_parser = argparse.ArgumentParser()
+    argument_parser.add_argument(
+        "--search",
+        choices=searches,
+        default="astar",
+        help="Search used for finding the lowest score.",
+    )
+    argument_parser.add_argument(
+        "--compare-searches",
+        action="store_true",
+        help="Only report the expanded states of all searches for the input.",
+    )
+    arguments = argument_parser.parse_args()
 
     print("Reading inputs...")
     example_input = read_input_from_file("example.txt")
@@ -193,11 +480,15 @@ def main():
     parsed_example = parse(example_input)
     parsed_input = parse(input)
 
+    if arguments.compare_searches:
+        compare_searches(parsed_input)
+        return
+
     print("\nSolving first part...")
     solve_part(
         parsed_example,
         parsed_input,
-        solve_first_part,
+        functools.partial(solve_first_part, search=arguments.search),
         given_example_solution_of_first_part,
     )
 
@@ -205,7 +496,7 @@ def main():
     solve_part(
         parsed_example,
         parsed_input,
-        solve_second_part,
+        functools.partial(solve_second_part, search=arguments.search),
         given_example_solution_of_second_part,
     )
 
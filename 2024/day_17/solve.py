@@ -1,7 +1,10 @@
+import argparse
+import functools
 import pathlib
-from typing import List
+from typing import Callable, List, Tuple
 import copy
 import time
+import numpy as np
 
 # The expected solutions for the example input of the first and second part of the puzzle used for checking the implemented algorithm.
 example_file = "example.txt"
@@ -20,6 +23,13 @@ class Computer:
             self.solution = input.split("\n")[6].split(" ")[-1]
         self.instruction_pointer = 0
         self.output = ""
+        self.compiled_program = None
+
+    def get_compiled_program(self) -> Callable[[int, int, int], List[int]]:
+        # Compiled once and reused for all runs with different registers.
+        if self.compiled_program is None:
+            self.compiled_program = compile_program(self.instructions)
+        return self.compiled_program
 
     def calculate_combo_operand(self, operand: int):
         if operand >= 0 and operand <= 3:
@@ -100,40 +110,265 @@ def run_program(computer: Computer) -> str:
     return computer.output
 
 
-def solve_first_part(computer: Computer) -> str:
-    return run_program(computer)
-
-
-def step_back(computer: Computer, final_A: int, iteration: int) -> None:
-    instructions = ",".join(map(str, computer.instructions))
-    B = computer.B
-    C = computer.C
-
-    # The range is valid for any input that only changes A in one adv instruction with an operand of 3.
-    for A in range(8 * final_A, 8 * final_A + 8):
-        # Reset computer
-        computer.A = A
-        computer.B = B
-        computer.C = C
-        computer.instruction_pointer = 0
-        computer.output = ""
-
-        # Execute all instructions but the last (this is assumed to be the jnz, that resets the instruction pointer)
-        while computer.instruction_pointer < len(computer.instructions) - 2:
-            execute_instruction(computer)
-        if computer.A == final_A and computer.output == str(
-            computer.instructions[-iteration]
-        ):
-            if run_program(computer) == instructions:
-                return A
-            result = step_back(computer, A, iteration + 1)
-            if result is not None:
-                return result
+def compile_combo_operand(operand: int) -> str:
+    if operand >= 0 and operand <= 3:
+        return str(operand)
+    if operand <= 6:
+        return "ABC"[operand - 4]
+    return None
+
+
+def compile_instruction(instruction: int, operand: int) -> str:
+    # Registers never become negative, so the truncating divisions are right shifts.
+    combo_operand = compile_combo_operand(operand)
+    if instruction in [0, 2, 5, 6, 7] and combo_operand is None:
+        return 'raise ValueError("Invalid operand!")'
+    if instruction == 0:
+        return f"A >>= {combo_operand}"
+    if instruction == 1:
+        return f"B ^= {operand}"
+    if instruction == 2:
+        return f"B = {combo_operand} & 7"
+    if instruction == 4:
+        return "B ^= C"
+    if instruction == 5:
+        return f"output.append({combo_operand} & 7)"
+    if instruction == 6:
+        return f"B = A >> {combo_operand}"
+    if instruction == 7:
+        return f"C = A >> {combo_operand}"
+    return 'raise ValueError("Invalid instruction!")'
+
+
+def compile_program(instructions: List[int]) -> Callable[[int, int, int], List[int]]:
+    # The program is translated once into Python source. Every reachable jump target starts a block,
+    # which runs straight to the end of the program and only checks the instruction pointer after a jump.
+    lines = [
+        "def program(A, B, C):",
+        "    output = []",
+        "    pointer = 0",
+        "    while True:",
+    ]
+    compiled_entries = set()
+    entries = [0]
+    while entries:
+        entry = entries.pop()
+        if entry in compiled_entries:
+            continue
+        compiled_entries.add(entry)
+        lines.append(f"        if pointer == {entry}:")
+        for pointer in range(entry, len(instructions) - 1, 2):
+            instruction = instructions[pointer]
+            operand = instructions[pointer + 1]
+            if instruction != 3:
+                lines.append("            " + compile_instruction(instruction, operand))
+            elif operand + 1 < len(instructions):
+                entries.append(operand)
+                lines += [
+                    "            if A != 0:",
+                    f"                pointer = {operand}",
+                    "                continue",
+                ]
+            else:
+                lines += ["            if A != 0:", "                return output"]
+        lines.append("            return output")
+    namespace = {}
+    exec("\n".join(lines), namespace)
+    return namespace["program"]
+
+
+def run_compiled_program(computer: Computer) -> str:
+    output = computer.get_compiled_program()(computer.A, computer.B, computer.C)
+    computer.output = ",".join(map(str, output))
+    return computer.output
+
+
+def shift_right(values: np.ndarray, shifts) -> np.ndarray:
+    # NumPy does not define shifts by 64 or more bits, while they give zero on the computer.
+    if np.isscalar(shifts):
+        return values >> shifts
+    return np.where(shifts < 64, values >> np.minimum(shifts, np.uint64(63)), 0).astype(
+        np.uint64
+    )
+
+
+def run_program_batch(computer: Computer, A_values) -> Tuple[np.ndarray, np.ndarray]:
+    # Runs the program for every initial value of A (below 2**64) in lockstep, returning the outputs of every
+    # machine padded with zeros and their lengths. Machines at the same instruction pointer execute it together,
+    # halted machines are removed from the running arrays.
+    instructions = computer.instructions
+    A = np.array(A_values, dtype=np.uint64).ravel()
+    outputs = np.zeros((len(A), 8), dtype=np.uint8)
+    lengths = np.zeros(len(A), dtype=np.int64)
+
+    machine_indices = np.arange(len(A))
+    B = np.full(len(A), computer.B, dtype=np.uint64)
+    C = np.full(len(A), computer.C, dtype=np.uint64)
+    pointers = np.zeros(len(A), dtype=np.int64)
+    running_outputs = np.zeros_like(outputs)
+    running_lengths = np.zeros_like(lengths)
+    while True:
+        halted = pointers + 1 >= len(instructions)
+        if halted.any():
+            outputs[machine_indices[halted]] = running_outputs[halted]
+            lengths[machine_indices[halted]] = running_lengths[halted]
+            running = ~halted
+            machine_indices = machine_indices[running]
+            A, B, C = A[running], B[running], C[running]
+            pointers = pointers[running]
+            running_outputs = running_outputs[running]
+            running_lengths = running_lengths[running]
+        if len(machine_indices) == 0:
+            break
+        if pointers.min() == pointers.max():
+            groups = [(pointers[0], slice(None))]
+        else:
+            groups = [
+                (pointer, np.flatnonzero(pointers == pointer))
+                for pointer in np.unique(pointers)
+            ]
+        for pointer, machines in groups:
+            instruction = instructions[pointer]
+            operand = instructions[pointer + 1]
+            if operand <= 3:
+                combo_operand = np.uint64(operand)
+            elif operand <= 6:
+                combo_operand = [A, B, C][operand - 4][machines]
+            elif instruction in [0, 2, 5, 6, 7]:
+                raise ValueError("Invalid operand!")
+
+            if instruction == 0:
+                A[machines] = shift_right(A[machines], combo_operand)
+            elif instruction == 1:
+                B[machines] ^= np.uint64(operand)
+            elif instruction == 2:
+                B[machines] = combo_operand & np.uint64(7)
+            elif instruction == 3:
+                pointers[machines] = np.where(A[machines] != 0, operand - 2, pointer)
+            elif instruction == 4:
+                B[machines] ^= C[machines]
+            elif instruction == 5:
+                positions = running_lengths[machines]
+                if positions.max() >= running_outputs.shape[1]:
+                    outputs = np.pad(outputs, ((0, 0), (0, outputs.shape[1])))
+                    running_outputs = np.pad(
+                        running_outputs, ((0, 0), (0, running_outputs.shape[1]))
+                    )
+                # Machines that have written the same number of outputs fill one column, otherwise every
+                # machine writes its own cell, which needs the rows as an index array next to the positions.
+                if positions.min() == positions.max():
+                    rows = machines
+                    positions = positions.max()
+                else:
+                    rows = np.arange(len(pointers))[machines]
+                running_outputs[rows, positions] = combo_operand & np.uint64(7)
+                running_lengths[machines] += 1
+            elif instruction == 6:
+                B[machines] = shift_right(A[machines], combo_operand)
+            elif instruction == 7:
+                C[machines] = shift_right(A[machines], combo_operand)
+            pointers[machines] += 2
+
+    return outputs, lengths
+
+
+def format_output(outputs: np.ndarray, lengths: np.ndarray) -> List[str]:
+    return [
+        ",".join(map(str, output[:length].tolist()))
+        for output, length in zip(outputs, lengths)
+    ]
+
+
+def screen_A_values(
+    computer: Computer, A_values, expected_output: List[int]
+) -> np.ndarray:
+    # Returns the values of A for which the program outputs exactly the expected digits.
+    A_values = np.array(A_values, dtype=np.uint64).ravel()
+    outputs, lengths = run_program_batch(computer, A_values)
+    if outputs.shape[1] < len(expected_output):
+        return A_values[:0]
+    matches = (lengths == len(expected_output)) & (
+        outputs[:, : len(expected_output)] == expected_output
+    ).all(axis=1)
+    return A_values[matches]
+
+
+engines = {"interpreter": run_program, "compiled": run_compiled_program}
+
+
+def solve_first_part(computer: Computer, engine: str = "compiled") -> str:
+    return engines[engine](computer)
+
+
+def analyze_loop(instructions: List[int]) -> Tuple[int, int]:
+    # The search needs a program that is a single loop, which shifts A by a constant number of bits and
+    # does not carry B or C over to the next iteration. Then every iteration only depends on the value of A
+    # at its start and the output is fixed from the last iteration backwards by a few bits of A at a time.
+    if len(instructions) % 2 != 0 or instructions[-2:] != [3, 0]:
+        raise ValueError("The program does not end with a jump to its start!")
+    shift = 0
+    number_of_outputs = 0
+    written_registers = set()
+    for instruction, operand in zip(instructions[:-2:2], instructions[1:-2:2]):
+        read_registers = set()
+        if instruction in [0, 2, 5, 6, 7]:
+            if operand == 7:
+                raise ValueError("Invalid operand!")
+            if operand in [5, 6]:
+                read_registers.add("BC"[operand - 5])
+        if instruction in [1, 4]:
+            read_registers.add("B")
+        if instruction == 4:
+            read_registers.add("C")
+        if not read_registers <= written_registers:
+            raise ValueError("The registers B and C are carried over between loops!")
+
+        if instruction == 0:
+            if operand > 3:
+                raise ValueError("A is not shifted by a constant number of bits!")
+            shift += operand
+        elif instruction in [1, 2, 4, 6]:
+            written_registers.add("B")
+        elif instruction == 3:
+            raise ValueError("The program contains more than one jump!")
+        elif instruction == 5:
+            number_of_outputs += 1
+        elif instruction == 7:
+            written_registers.add("C")
+    if shift == 0:
+        raise ValueError("A is not shifted in the loop!")
+    if number_of_outputs == 0:
+        raise ValueError("The loop does not output anything!")
+    return shift, number_of_outputs
+
+
+def find_lowest_A(computer: Computer, output: List[int]) -> int | None:
+    shift, number_of_outputs = analyze_loop(computer.instructions)
+    if len(output) % number_of_outputs != 0:
+        return None
+    program = computer.get_compiled_program()
+
+    # Depth-first from the last loop, each loop prepends the low bits of A in ascending order. All solutions
+    # run the same number of loops, so the first complete match is the lowest one.
+    candidates = [(0, number_of_outputs)]
+    while candidates:
+        final_A, length = candidates.pop()
+        expected_output = output[-length:]
+        matching_A_values = [
+            A
+            for A in range(final_A << shift, (final_A + 1) << shift)
+            if program(A, computer.B, computer.C) == expected_output
+        ]
+        if length == len(output) and matching_A_values:
+            return matching_A_values[0]
+        candidates.extend(
+            (A, length + number_of_outputs) for A in reversed(matching_A_values)
+        )
     return None
 
 
 def solve_second_part(computer: Computer) -> int:
-    return step_back(computer, 0, 1)
+    return find_lowest_A(computer, computer.instructions)
 
 
 def read_input_from_file(path: str) -> str | None:
@@ -181,6 +416,22 @@ def solve_part(example, input, solver: callable, given_solution: int) -> None:
 
 
 def main():
+    argument_parser = argparse.ArgumentParser()
+    argument_parser.add_argument(
+        "--engine",
+        choices=engines.keys(),
+        default="compiled",
+        help="Whether the program is interpreted or compiled to Python for the first part.",
+    )
+    argument_parser.add_argument(
+        "--screen",
+        type=int,
+        nargs=2,
+        metavar=("FIRST_A", "NUMBER"),
+        help="Run the program for a range of initial values of A at once and list those reproducing the program.",
+    )
+    arguments = argument_parser.parse_args()
+
     print("Reading inputs...")
     example_input = read_input_from_file(example_file)
     input = read_input_from_file("input.txt")
@@ -196,7 +447,7 @@ def main():
     solve_part(
         example_computer,
         computer,
-        solve_first_part,
+        functools.partial(solve_first_part, engine=arguments.engine),
         example_computer.solution,
     )
 
@@ -208,6 +459,18 @@ def main():
         given_example_solution_of_second_part,
     )
 
+    if arguments.screen is not None:
+        first_A, number = arguments.screen
+        print(f"\nScreening {number} initial values of A starting at {first_A}...")
+        begin = time.time()
+        matching_A_values = screen_A_values(
+            original_computer,
+            np.arange(first_A, first_A + number, dtype=np.uint64),
+            original_computer.instructions,
+        )
+        print(f"{time.time()-begin} seconds needed to screen the values.")
+        print(f"The program is reproduced for A in {matching_A_values.tolist()}")
+
 
 if __name__ == "__main__":
     main()